@@ -4,10 +4,11 @@ from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy import text
 
 from alembic import context
 from configs.db import Base  # Ensure your models are imported here to populate metadata
-from models import email_log, form  # Example model import
+from models import email_log, form, rate_limit, idempotency, job_heartbeat, ip_blocklist  # Example model import
 
 env_file = os.getenv("ENV_FILE", ".env")
 load_dotenv(dotenv_path=env_file, override=True)
@@ -26,6 +27,12 @@ if config.config_file_name is not None:
 
 print("Alembic connecting to:", DATABASE_URL)
 
+# transactional (default): all pending revisions run in one transaction.
+# lock_safe: every revision runs in its own transaction, with a lock_timeout so a DDL statement waiting behind a
+# long running query fails fast instead of blocking all writes to the table. Needed by migration_helpers.py.
+MIGRATION_MODE = os.getenv("MIGRATION_MODE", "transactional")
+MIGRATION_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "3s")
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
@@ -76,8 +83,14 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        lock_safe = MIGRATION_MODE == "lock_safe"
+        if lock_safe:
+            connection.execute(text("SELECT set_config('lock_timeout', :value, false)"), {"value": MIGRATION_LOCK_TIMEOUT})
+            connection.commit()
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            transaction_per_migration=lock_safe,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,33 @@
+"""record failed runs in job_heartbeats
+
+Revision ID: 0b6e2d9c4a17
+Revises: f3c1d8a6b254
+Create Date: 2026-10-20 10:02:31.784415
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0b6e2d9c4a17'
+down_revision: Union[str, Sequence[str], None] = 'f3c1d8a6b254'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('job_heartbeats', sa.Column('last_failure_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('job_heartbeats', sa.Column('last_error', sa.String(), nullable=True))
+    # a job can fail before it ever succeeded
+    op.alter_column('job_heartbeats', 'last_success_at', existing_type=sa.DateTime(timezone=True), nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM job_heartbeats WHERE last_success_at IS NULL")
+    op.alter_column('job_heartbeats', 'last_success_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+    op.drop_column('job_heartbeats', 'last_error')
+    op.drop_column('job_heartbeats', 'last_failure_at')
@@ -0,0 +1,112 @@
+"""partition email_logs and form_submission_log monthly on created_at
+
+Revision ID: 3c9e1f7a2b4d
+Revises: e6034481a741
+Create Date: 2026-10-19 10:12:04.118532
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9e1f7a2b4d'
+down_revision: Union[str, Sequence[str], None] = 'e6034481a741'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Number of monthly partitions created ahead of the current month. The retention cron keeps this window rolling.
+MONTHS_AHEAD = 3
+
+# table name -> plain (non unique) indexes that have to be recreated on the partitioned table
+PARTITIONED_TABLES = {
+    'email_logs': {'ix_email_logs_id': ['id']},
+    'form_submission_log': {
+        'ix_form_submission_log_id': ['id'],
+        'ix_form_submission_log_x_real_ip': ['x_real_ip'],
+    },
+}
+FOREIGN_KEYS = {
+    'form_submission_log': ('form_submission_log_form_id_fkey', 'form_id', 'zaansrecht_form', 'id'),
+}
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _month_range(start: date, end: date) -> list[date]:
+    months = []
+    current = date(start.year, start.month, 1)
+    while current <= end:
+        months.append(current)
+        current = _add_months(current, 1)
+    return months
+
+
+def _create_partitions(table: str, oldest: datetime | None) -> None:
+    today = datetime.now(timezone.utc).date()
+    start = oldest.date() if oldest else today
+    for month in _month_range(start, _add_months(today, MONTHS_AHEAD)):
+        op.execute(
+            f"CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        )
+    # catch-all so inserts never fail when the cron did not create a partition in time
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+
+def _swap_table(table: str, partitioned: bool) -> None:
+    """Rebuild `table` as a (non) partitioned copy of itself, moving all rows over."""
+    bind = op.get_bind()
+    old_table = f"{table}_old"
+
+    op.execute(f"ALTER TABLE {table} RENAME TO {old_table}")
+    op.execute(f"ALTER TABLE {old_table} RENAME CONSTRAINT {table}_pkey TO {old_table}_pkey")
+    for index_name in PARTITIONED_TABLES[table]:
+        op.execute(f"ALTER INDEX IF EXISTS {index_name} RENAME TO {index_name}_old")
+
+    if partitioned:
+        # the partition key can not be NULL, older rows fall back to the moment of migrating
+        op.execute(f"UPDATE {old_table} SET created_at = now() WHERE created_at IS NULL")
+        op.execute(f"CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL")
+        # the primary key of a partitioned table has to include the partition key
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)")
+        oldest = bind.execute(sa.text(f"SELECT min(created_at) FROM {old_table}")).scalar()
+        _create_partitions(table, oldest)
+    else:
+        op.execute(f"CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS)")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN created_at DROP NOT NULL")
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)")
+
+    if table in FOREIGN_KEYS:
+        name, column, ref_table, ref_column = FOREIGN_KEYS[table]
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {ref_table} ({ref_column})")
+
+    op.execute(f"INSERT INTO {table} SELECT * FROM {old_table}")
+
+    # keep the id sequence alive when the old table is dropped
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": old_table}).scalar()
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+    op.execute(f"DROP TABLE {old_table}")
+
+    for index_name, columns in PARTITIONED_TABLES[table].items():
+        op.create_index(index_name, table, columns, unique=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in PARTITIONED_TABLES:
+        _swap_table(table, partitioned=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in PARTITIONED_TABLES:
+        _swap_table(table, partitioned=False)
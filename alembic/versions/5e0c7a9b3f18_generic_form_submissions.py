@@ -0,0 +1,54 @@
+"""generic form submissions with a JSONB payload
+
+Revision ID: 5e0c7a9b3f18
+Revises: d4a8f3e6c2b1
+Create Date: 2026-10-19 19:05:13.240871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0c7a9b3f18'
+down_revision: Union[str, Sequence[str], None] = 'd4a8f3e6c2b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('form_submissions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('form_type', sa.String(), nullable=False),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_form_submissions_id'), 'form_submissions', ['id'], unique=False)
+    op.create_index('ix_form_submissions_form_type_status', 'form_submissions', ['form_type', 'status'], unique=False)
+    op.create_index('ix_form_submissions_payload', 'form_submissions', ['payload'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'payload': 'jsonb_path_ops'})
+    op.add_column('form_submission_log', sa.Column('submission_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_form_submission_log_submission_id'), 'form_submission_log', ['submission_id'], unique=False)
+    op.create_foreign_key('form_submission_log_submission_id_fkey', 'form_submission_log', 'form_submissions',
+                          ['submission_id'], ['id'])
+    op.alter_column('form_submission_log', 'form_id', existing_type=sa.Integer(), nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM form_submission_log WHERE form_id IS NULL")
+    op.alter_column('form_submission_log', 'form_id', existing_type=sa.Integer(), nullable=False)
+    op.drop_constraint('form_submission_log_submission_id_fkey', 'form_submission_log', type_='foreignkey')
+    op.drop_index(op.f('ix_form_submission_log_submission_id'), table_name='form_submission_log')
+    op.drop_column('form_submission_log', 'submission_id')
+    op.drop_index('ix_form_submissions_payload', table_name='form_submissions', postgresql_using='gin')
+    op.drop_index('ix_form_submissions_form_type_status', table_name='form_submissions')
+    op.drop_index(op.f('ix_form_submissions_id'), table_name='form_submissions')
+    op.drop_table('form_submissions')
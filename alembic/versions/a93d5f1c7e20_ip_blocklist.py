@@ -0,0 +1,46 @@
+"""ip blocklist and GiST inet_ops index on the submission log IPs
+
+Revision ID: a93d5f1c7e20
+Revises: 5e0c7a9b3f18
+Create Date: 2026-10-19 20:12:48.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from migration_helpers import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = 'a93d5f1c7e20'
+down_revision: Union[str, Sequence[str], None] = '5e0c7a9b3f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ip_blocklist',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('network', postgresql.CIDR(), nullable=False),
+    sa.Column('reason', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('network')
+    )
+    op.create_index(op.f('ix_ip_blocklist_id'), 'ip_blocklist', ['id'], unique=False)
+    op.create_index('ix_ip_blocklist_network_gist', 'ip_blocklist', ['network'], unique=False,
+                    postgresql_using='gist', postgresql_ops={'network': 'inet_ops'})
+    # form_submission_log is large and written by every submission, build the index per partition without blocking
+    create_index_concurrently('ix_form_submission_log_x_real_ip_gist', 'form_submission_log', ['x_real_ip'],
+                              postgresql_using='gist', postgresql_ops={'x_real_ip': 'inet_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_form_submission_log_x_real_ip_gist', 'form_submission_log')
+    op.drop_index('ix_ip_blocklist_network_gist', table_name='ip_blocklist', postgresql_using='gist')
+    op.drop_index(op.f('ix_ip_blocklist_id'), table_name='ip_blocklist')
+    op.drop_table('ip_blocklist')
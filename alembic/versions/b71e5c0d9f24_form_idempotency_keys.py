@@ -0,0 +1,36 @@
+"""form idempotency keys for duplicate submission detection
+
+Revision ID: b71e5c0d9f24
+Revises: 8f2d4b6e1a3c
+Create Date: 2026-10-19 15:02:51.873120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71e5c0d9f24'
+down_revision: Union[str, Sequence[str], None] = '8f2d4b6e1a3c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('form_idempotency_keys',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('form_id', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['form_id'], ['zaansrecht_form.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_form_idempotency_keys_expires_at'), 'form_idempotency_keys', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_form_idempotency_keys_expires_at'), table_name='form_idempotency_keys')
+    op.drop_table('form_idempotency_keys')
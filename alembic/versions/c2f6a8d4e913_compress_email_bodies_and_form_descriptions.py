@@ -0,0 +1,53 @@
+"""store email bodies and form descriptions compressed (expand)
+
+Revision ID: c2f6a8d4e913
+Revises: a93d5f1c7e20
+Create Date: 2026-10-19 22:41:05.127934
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from migration_helpers import add_column, create_copy_trigger, drop_column, drop_copy_trigger, rewrite_in_batches
+from models.compressed_text import compress_text
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2f6a8d4e913'
+down_revision: Union[str, Sequence[str], None] = 'a93d5f1c7e20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table, column, columns identifying a row (email_logs is partitioned on created_at)
+COLUMNS = [
+    ('email_logs', 'body', {'id': sa.Integer(), 'created_at': sa.DateTime(timezone=True)}),
+    ('zaansrecht_form', 'description', {'id': sa.Integer()}),
+]
+# stored uncompressed (0xFE header), it reads the same
+COPY_EXPRESSION = "'\\xfe'::bytea || convert_to(NEW.{column}, 'UTF8')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # expand only: the app writes the text column and its compressed copy, and still reads the text column.
+    # Revision d5b8e1f04c36 (contract) drops the text columns once every instance runs the release that reads the copy.
+    for table_name, column, match_columns in COLUMNS:
+        new_column = f'{column}_compressed'
+        add_column(table_name, sa.Column(new_column, sa.LargeBinary(), nullable=True))
+        # instances of the previous release only write the text column; created before the backfill, so no row
+        # written meanwhile is missed
+        create_copy_trigger(table_name, column, new_column, COPY_EXPRESSION.format(column=column))
+        rewrite_in_batches(
+            table_name,
+            match_columns,
+            [column],
+            {new_column: sa.LargeBinary()},
+            lambda row, column=column, new_column=new_column: {new_column: compress_text(row[column])},
+            where_clause=f'{column} IS NOT NULL AND {new_column} IS NULL',
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table_name, column, _ in COLUMNS:
+        drop_copy_trigger(table_name, column)
+        drop_column(table_name, f'{column}_compressed')
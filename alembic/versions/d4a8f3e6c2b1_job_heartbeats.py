@@ -0,0 +1,32 @@
+"""job heartbeats to report the last successful queue drain
+
+Revision ID: d4a8f3e6c2b1
+Revises: b71e5c0d9f24
+Create Date: 2026-10-19 16:27:40.662915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a8f3e6c2b1'
+down_revision: Union[str, Sequence[str], None] = 'b71e5c0d9f24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('job_heartbeats',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('last_success_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('job_heartbeats')
@@ -0,0 +1,65 @@
+"""drop the uncompressed email bodies and form descriptions (contract)
+
+Revision ID: d5b8e1f04c36
+Revises: 0b6e2d9c4a17
+Create Date: 2026-10-20 11:14:52.306518
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from migration_helpers import add_column, create_copy_trigger, drop_column, drop_copy_trigger, rewrite_in_batches
+from models.compressed_text import compress_text, decompress_text
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5b8e1f04c36'
+down_revision: Union[str, Sequence[str], None] = '0b6e2d9c4a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table, column, columns identifying a row (email_logs is partitioned on created_at)
+COLUMNS = [
+    ('email_logs', 'body', {'id': sa.Integer(), 'created_at': sa.DateTime(timezone=True)}),
+    ('zaansrecht_form', 'description', {'id': sa.Integer()}),
+]
+# see revision c2f6a8d4e913
+COPY_EXPRESSION = "'\\xfe'::bytea || convert_to(NEW.{column}, 'UTF8')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # run only when every app instance reads the compressed columns: instances of the expand release still write
+    # the text columns and fail once they are gone
+    for table_name, column, match_columns in COLUMNS:
+        new_column = f'{column}_compressed'
+        # the copy trigger left no gaps, this only finds rows when it was bypassed (e.g. disabled for a restore)
+        rewrite_in_batches(
+            table_name,
+            match_columns,
+            [column],
+            {new_column: sa.LargeBinary()},
+            lambda row, column=column, new_column=new_column: {new_column: compress_text(row[column])},
+            where_clause=f'{column} IS NOT NULL AND {new_column} IS NULL',
+        )
+        drop_copy_trigger(table_name, column)
+        # the space of the text column is reclaimed as rows are rewritten, or at once with pg_repack / VACUUM FULL
+        drop_column(table_name, column)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # restores the schema of the expand release. Stop the app first: this release only writes the compressed
+    # columns, and zlib values can not be copied back to text in SQL
+    for table_name, column, match_columns in COLUMNS:
+        new_column = f'{column}_compressed'
+        add_column(table_name, sa.Column(column, sa.Text(), nullable=True))
+        # part of the expand schema, for instances of the release before it
+        create_copy_trigger(table_name, column, new_column, COPY_EXPRESSION.format(column=column))
+        rewrite_in_batches(
+            table_name,
+            match_columns,
+            [new_column],
+            {column: sa.Text()},
+            lambda row, column=column, new_column=new_column: {column: decompress_text(row[new_column])},
+            where_clause=f'{new_column} IS NOT NULL AND {column} IS NULL',
+        )
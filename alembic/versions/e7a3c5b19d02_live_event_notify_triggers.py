@@ -0,0 +1,63 @@
+"""NOTIFY triggers for the live event feed of form and email status changes
+
+Revision ID: e7a3c5b19d02
+Revises: c2f6a8d4e913
+Create Date: 2026-10-19 23:26:37.540912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from migration_helpers import run_guarded
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3c5b19d02'
+down_revision: Union[str, Sequence[str], None] = 'c2f6a8d4e913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> topic of services/live_events_service.py
+TRIGGERS = {'zaansrecht_form': 'form', 'email_logs': 'email'}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # event ids are unique over all workers; they resume by position in the stream, so ordering is not needed
+    op.execute("CREATE SEQUENCE live_event_id_seq")
+    op.execute("""
+        CREATE FUNCTION notify_live_event() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND OLD.status IS NOT DISTINCT FROM NEW.status THEN
+                RETURN NULL;
+            END IF;
+            PERFORM pg_notify('live_events', json_build_object(
+                'event_id', nextval('live_event_id_seq'),
+                'topic', TG_ARGV[0],
+                'event', CASE TG_OP WHEN 'INSERT' THEN 'created' ELSE 'status' END,
+                'id', NEW.id,
+                'status', NEW.status,
+                'previous_status', CASE TG_OP WHEN 'UPDATE' THEN OLD.status END,
+                'at', now()
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table_name, topic in TRIGGERS.items():
+        # on the partitioned email_logs the trigger is cloned to every partition, also future ones
+        run_guarded(
+            f"CREATE TRIGGER {table_name}_live_events AFTER INSERT OR UPDATE OF status ON {table_name} "
+            f"FOR EACH ROW EXECUTE FUNCTION notify_live_event('{topic}')",
+            description=f"CREATE TRIGGER {table_name}_live_events",
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table_name in TRIGGERS:
+        run_guarded(
+            f"DROP TRIGGER IF EXISTS {table_name}_live_events ON {table_name}",
+            description=f"DROP TRIGGER {table_name}_live_events",
+        )
+    op.execute("DROP FUNCTION IF EXISTS notify_live_event()")
+    op.execute("DROP SEQUENCE IF EXISTS live_event_id_seq")
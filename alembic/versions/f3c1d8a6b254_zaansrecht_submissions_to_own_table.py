@@ -0,0 +1,52 @@
+"""move generic zaansrecht submissions to zaansrecht_form and check the submission log owner
+
+Revision ID: f3c1d8a6b254
+Revises: e7a3c5b19d02
+Create Date: 2026-10-20 09:14:52.603178
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from migration_helpers import add_check_constraint, run_guarded
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c1d8a6b254'
+down_revision: Union[str, Sequence[str], None] = 'e7a3c5b19d02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # "zaansrecht" was also a generic form type; its submissions join the forms of the zaansrecht_form table and
+    # their logs are pointed at the new rows. The sync trigger of the description fills its compressed copy.
+    op.execute("""
+        WITH moved AS MATERIALIZED (
+            SELECT id AS submission_id, nextval(pg_get_serial_sequence('zaansrecht_form', 'id')) AS form_id,
+                   status, payload, created_at, updated_at
+            FROM form_submissions WHERE form_type = 'zaansrecht'
+        ), inserted AS (
+            INSERT INTO zaansrecht_form (id, full_name, email, status, created_at, updated_at, terms_accepted,
+                                         telephone, description, subject, meeting_datetime, meeting_type)
+            SELECT form_id, payload->>'full_name', payload->>'email', status, created_at, updated_at,
+                   COALESCE((payload->>'terms_accepted')::boolean, false), payload->>'telephone',
+                   payload->>'description', payload->>'subject',
+                   (payload->>'meeting_datetime')::timestamptz, payload->>'meeting_type'
+            FROM moved
+        )
+        UPDATE form_submission_log SET form_id = moved.form_id, submission_id = NULL
+        FROM moved WHERE form_submission_log.submission_id = moved.submission_id
+    """)
+    op.execute("DELETE FROM form_submissions WHERE form_type = 'zaansrecht'")
+    # logs without a form can not be attributed to anything
+    op.execute("DELETE FROM form_submission_log WHERE form_id IS NULL AND submission_id IS NULL")
+    add_check_constraint('ck_form_submission_log_one_form', 'form_submission_log',
+                         'num_nonnulls(form_id, submission_id) = 1')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # the moved submissions stay in zaansrecht_form
+    run_guarded("ALTER TABLE form_submission_log DROP CONSTRAINT IF EXISTS ck_form_submission_log_one_form",
+                description="DROP CONSTRAINT ck_form_submission_log_one_form")
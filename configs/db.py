@@ -1,10 +1,13 @@
 # app/db.py
 import os
+import logging
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
+from configs.query_stats import instrument_engine
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
@@ -12,14 +15,31 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
+POOL_SIZE = 10      # max persistent connections in the pool
+MAX_OVERFLOW = 5    # allow temporary extra connections
+POOL_TIMEOUT = 30   # wait max 30s for a connection
+
 engine = create_engine(
     DATABASE_URL,
     echo=False,
     pool_pre_ping=True, # test connections before using them, avoid stale connections
-    pool_size=10,       # max persistent connections in the pool
-    max_overflow=5,     # allow temporary extra connections
-    pool_timeout=30,    # wait max 30s for a connection
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
 )
+# statement counts per request and the slow query log
+instrument_engine(engine)
+
+
+def _dispose_engine_after_fork():
+    """A forked worker must never reuse the connections of its parent: drop the inherited pool
+    without closing the sockets, which still belong to the parent process."""
+    engine.dispose(close=False)
+    logger.debug("Disposed the inherited connection pool in worker %d", os.getpid())
+
+
+os.register_at_fork(after_in_child=_dispose_engine_after_fork)
+
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
@@ -0,0 +1,32 @@
+# app/configs/http_client.py
+import logging
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Shared client so upstream calls reuse connections (and TLS sessions) instead of opening one per request.
+# It is owned by the app lifespan, see main.py.
+_client: httpx.AsyncClient | None = None
+
+
+def start_http_client():
+    """Create the shared HTTP client for this process."""
+    global _client
+    _client = httpx.AsyncClient(timeout=httpx.Timeout(5.0), limits=httpx.Limits(max_connections=100))
+    logger.info("Shared HTTP client started")
+
+
+async def close_http_client():
+    """Close the shared HTTP client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("Shared HTTP client closed")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client, creating it when no lifespan ran (e.g. serverless)."""
+    if _client is None:
+        start_http_client()
+    return _client
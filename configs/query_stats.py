@@ -0,0 +1,121 @@
+# app/configs/query_stats.py
+"""
+SQL statement instrumentation. `instrument_engine` hooks the cursor events of an engine to:
+- count the statements and the DB time of the current request (QueryStatsMiddleware sets up the per request stats),
+- log statements slower than SLOW_QUERY_MS, with the parameter values redacted to their types,
+- let tests capture the statements of a block with `capture_queries` / `assert_max_queries`, e.g.
+
+    with assert_max_queries(3):
+        client.post("/api/v1/forms/zaansrecht", ...)
+"""
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+# the same statement this often in one request is reported as a possible N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 3))
+
+
+class QueryStats:
+    """Statements executed in one request or captured block, counted per statement text."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration: float):
+        with self._lock:
+            self.count += 1
+            self.duration += duration
+            self.statements[statement] += 1
+
+    @property
+    def duration_ms(self) -> float:
+        return round(self.duration * 1000, 1)
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> list[tuple[str, int]]:
+        """Statements executed at least `threshold` times, the usual sign of a lazy load in a loop."""
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+# stats of the request being handled; the threadpool copies the context, so sync routes count as well
+current_query_stats: contextvars.ContextVar[QueryStats | None] = contextvars.ContextVar("current_query_stats", default=None)
+# blocks of capture_queries, they see the statements of every thread (e.g. the app thread of a TestClient)
+_captures: list[QueryStats] = []
+
+
+def redact_parameters(parameters):
+    """Replace parameter values by their type name, the values may hold personal data."""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"<{len(parameters)} parameter sets>"
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_times")
+    if not start_times:
+        return
+    duration = time.perf_counter() - start_times.pop()
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    for capture in tuple(_captures):
+        capture.record(statement, duration)
+    if duration * 1000 >= SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1fms): %s parameters=%s", duration * 1000, statement, redact_parameters(parameters))
+
+
+def _handle_error(context):
+    # a failed statement never reaches after_cursor_execute, drop its start time
+    start_times = context.connection.info.get("query_start_times") if context.connection is not None else None
+    if start_times:
+        start_times.pop()
+
+
+def instrument_engine(engine: Engine):
+    """Hook the statement counting and the slow query log into an engine."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+@contextmanager
+def capture_queries():
+    """Collect the statements executed by any thread inside the block. Meant for tests."""
+    stats = QueryStats()
+    _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        _captures.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int):
+    """Fail when the block executes more than `max_queries` statements, listing them. Meant for tests."""
+    with capture_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        executed = "\n".join(f"{count}x {statement}" for statement, count in stats.statements.most_common())
+        raise AssertionError(f"{stats.count} queries executed, the budget is {max_queries}:\n{executed}")
@@ -0,0 +1,194 @@
+# app/configs/replicas.py
+"""
+Read replica routing. Read-only endpoints use `get_read_db`, which hands out a session on one of the
+DATABASE_REPLICA_URLS (round-robin), skipping replicas that lag more than REPLICA_MAX_LAG_SECONDS or are
+unreachable, and falling back to the primary. A request can force the primary for read-after-write
+with the `X-Read-Primary: true` header. Without replica URLs everything uses the primary.
+
+The lag is probed by a background task every REPLICA_LAG_CHECK_INTERVAL_SECONDS, never on the request path. A probe
+compares the replay position of each replica with the current WAL position of the primary. A replica that replayed
+it is current, also when the primary had nothing to send for hours. Otherwise its lag is the smaller of the age of
+its last replayed transaction and the time since an earlier probe whose primary position it did replay. Without the
+probe task (no lifespan) or with a stale probe result the primary is used.
+"""
+import os
+import time
+import asyncio
+import logging
+import itertools
+from collections import deque
+from fastapi import Request
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import text
+from dotenv import load_dotenv
+from configs.db import engine, SessionLocal, POOL_SIZE, MAX_OVERFLOW, POOL_TIMEOUT
+from configs.query_stats import instrument_engine
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 5))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL_SECONDS", 5))
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("REPLICA_CONNECT_TIMEOUT_SECONDS", 2))
+# a probe result older than this is not trusted, e.g. when the probe task is stuck
+REPLICA_MAX_PROBE_AGE = REPLICA_LAG_CHECK_INTERVAL * 3
+READ_PRIMARY_HEADER = "x-read-primary"
+
+PRIMARY_LSN_QUERY = text("SELECT pg_current_wal_lsn()::text")
+REPLICA_LAG_QUERY = text(
+    "SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn()::text, "
+    "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+)
+
+
+def parse_lsn(lsn: str | None) -> int | None:
+    """A WAL position like 16/B374D848 as an integer, so positions can be compared."""
+    if lsn is None:
+        return None
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+class Replica:
+    def __init__(self, name: str, replica_engine: Engine):
+        self.name = name
+        self.engine = replica_engine
+        self.lag: float | None = None
+        self.healthy = False
+        self.checked_at: float | None = None
+
+    def usable(self) -> bool:
+        """Whether the last probe found the replica reachable and close enough to the primary. Never blocks."""
+        if self.checked_at is None or time.monotonic() - self.checked_at > REPLICA_MAX_PROBE_AGE:
+            return False
+        return self.healthy and self.lag is not None and self.lag <= REPLICA_MAX_LAG_SECONDS
+
+    def probe(self, primary_lsn: int | None, primary_positions: deque):
+        """Measure the lag against the primary position and the earlier (time, position) samples of the primary."""
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text(f"SET LOCAL statement_timeout = {REPLICA_CONNECT_TIMEOUT * 1000}"))
+                in_recovery, replay_lsn, replay_age = connection.execute(REPLICA_LAG_QUERY).one()
+        except Exception as e:
+            logger.error("Replica %s is unreachable: %s", self.name, e)
+            self.healthy, self.lag, self.checked_at = False, None, time.monotonic()
+            return
+        self.healthy, self.checked_at = True, time.monotonic()
+        self.lag = self._lag(in_recovery, parse_lsn(replay_lsn), replay_age, primary_lsn, primary_positions)
+        if self.lag is None or self.lag > REPLICA_MAX_LAG_SECONDS:
+            logger.warning("Replica %s lags %s behind, reading from elsewhere", self.name,
+                           "an unknown time" if self.lag is None else f"{self.lag:.1f}s")
+
+    @staticmethod
+    def _lag(in_recovery, replay_lsn, replay_age, primary_lsn, primary_positions) -> float | None:
+        if not in_recovery:
+            # not a standby (e.g. a promoted replica), it is as current as it gets
+            return 0.0
+        if replay_lsn is not None and primary_lsn is not None and replay_lsn >= primary_lsn:
+            return 0.0
+        candidates = []
+        if replay_age is not None:
+            candidates.append(max(float(replay_age), 0.0))
+        if replay_lsn is not None:
+            # the replica holds everything the primary had at the latest sample it replayed
+            replayed_at = [sampled_at for sampled_at, lsn in primary_positions if lsn <= replay_lsn]
+            if replayed_at:
+                candidates.append(time.monotonic() - max(replayed_at))
+        return min(candidates) if candidates else None
+
+    def stats(self) -> dict:
+        probe_age = None if self.checked_at is None else round(time.monotonic() - self.checked_at, 1)
+        return {"healthy": self.healthy, "lag_seconds": self.lag, "probe_age_seconds": probe_age, "usable": self.usable()}
+
+
+class ReplicaRouter:
+    def __init__(self, urls: list[str]):
+        self.replicas = []
+        for index, url in enumerate(urls):
+            replica_engine = create_engine(
+                url,
+                echo=False,
+                pool_pre_ping=True,
+                pool_size=POOL_SIZE,
+                max_overflow=MAX_OVERFLOW,
+                pool_timeout=POOL_TIMEOUT,
+                # an unreachable replica must not hang the probe
+                connect_args={"connect_timeout": REPLICA_CONNECT_TIMEOUT},
+            )
+            instrument_engine(replica_engine)
+            self.replicas.append(Replica(f"replica-{index}", replica_engine))
+        self._next = itertools.count()
+        # (monotonic time, WAL position) of the primary at the recent probes
+        self._primary_positions: deque[tuple[float, int]] = deque(maxlen=max(int(60 / REPLICA_LAG_CHECK_INTERVAL), 2))
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self.replicas:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.probe)
+            except Exception as e:
+                logger.error("Replica probe failed: %s", e)
+            await asyncio.sleep(REPLICA_LAG_CHECK_INTERVAL)
+
+    def probe(self):
+        """Sample the primary WAL position, then measure every replica against it."""
+        primary_lsn = None
+        try:
+            with engine.connect() as connection:
+                primary_lsn = parse_lsn(connection.execute(PRIMARY_LSN_QUERY).scalar())
+        except Exception as e:
+            logger.error("Reading the WAL position of the primary failed: %s", e)
+        for replica in self.replicas:
+            replica.probe(primary_lsn, self._primary_positions)
+        if primary_lsn is not None:
+            self._primary_positions.append((time.monotonic(), primary_lsn))
+
+    def read_engine(self) -> Engine:
+        """The next usable replica in round-robin order, or the primary when none is usable."""
+        count = len(self.replicas)
+        if count:
+            start = next(self._next)
+            for offset in range(count):
+                replica = self.replicas[(start + offset) % count]
+                if replica.usable():
+                    return replica.engine
+            logger.warning("No usable replica, reading from the primary")
+        return engine
+
+    def dispose(self, close: bool = True):
+        for replica in self.replicas:
+            replica.engine.dispose(close=close)
+
+    def stats(self) -> dict:
+        return {replica.name: replica.stats() for replica in self.replicas}
+
+
+replica_router = ReplicaRouter(DATABASE_REPLICA_URLS)
+os.register_at_fork(after_in_child=lambda: replica_router.dispose(close=False))
+
+
+# Dependency for read-only FastAPI endpoints
+def get_read_db(request: Request):
+    if request.headers.get(READ_PRIMARY_HEADER, "").lower() in ("1", "true"):
+        db = SessionLocal()
+    else:
+        db = SessionLocal(bind=replica_router.read_engine())
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,39 @@
+# app/cron/retention.py
+import logging
+from sqlalchemy.orm import Session
+from configs.db import SessionLocal
+from services.retention_service import RetentionService
+from services.idempotency_service import IdempotencyService
+
+logger = logging.getLogger(__name__)
+
+
+def run_retention(db: Session = None):
+    """Roll the partition window forward, archive expired partitions, archive old forms, fail emails that stayed
+    queued too long and purge idempotency keys."""
+    close_db = False
+    if db is None:
+        db = SessionLocal()
+        close_db = True
+    try:
+        retention_service = RetentionService(db)
+        created = retention_service.ensure_partitions()
+        logger.info("Cronjob: Created %d new partitions", len(created))
+        archived = retention_service.archive_expired_partitions()
+        logger.info("Cronjob: Archived %d expired partitions", len(archived))
+        forms = retention_service.archive_old_forms()
+        logger.info("Cronjob: Moved %d old forms to ARCHIVED", forms)
+        expired = retention_service.fail_expired_queued_emails()
+        logger.info("Cronjob: Marked %d expired queued emails as FAILED", expired)
+        keys = IdempotencyService(db).purge_expired()
+        logger.info("Cronjob: Purged %d expired idempotency keys", keys)
+    finally:
+        if close_db:
+            db.close()
+
+
+if __name__ == "__main__":
+    from configs.logs import setup_logging
+
+    setup_logging()
+    run_retention()
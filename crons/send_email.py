@@ -1,39 +1,173 @@
 # app/cron/send_email.py
+"""
+Drain of the email queue, run by the cronjob endpoint inside a time-limited serverless function.
+The drain works within a time budget: it claims the oldest queued emails in small chunks and stops before a send
+could overrun the deadline. It reports what is left so the next tick continues where this one stopped.
+Claimed emails are marked SENDING. Emails left SENDING by a killed invocation are queued again after
+EMAIL_SENDING_LEASE_MINUTES.
+"""
 import asyncio
+import datetime
 import logging
+import os
+import time
+from sqlalchemy import func, update
 from sqlalchemy.orm import Session
-from configs.db import get_db as get_db_session
-from services.emai_service import EmailService
+from configs.db import SessionLocal
+from services.emai_service import EmailService, QUEUED_LOOKBACK, SMTP_TIMEOUT
 from models.email_log import EmailLog
 from enums import EmailStatus
+import exceptions as exceptions
+from services.health_service import record_job_success, record_job_failure, EMAIL_DRAIN_JOB
+from dotenv import load_dotenv
+
+load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-async def send_queued_emails(db: Session = None):
-    """Send all queued emails."""
+# keep this below the function timeout of the platform, minus the time the request needs before the drain starts
+EMAIL_DRAIN_TIME_BUDGET = float(os.getenv("EMAIL_DRAIN_TIME_BUDGET_SECONDS", 20))
+EMAIL_DRAIN_CHUNK_SIZE = int(os.getenv("EMAIL_DRAIN_CHUNK_SIZE", 10))
+# a claimed email still SENDING after this was claimed by an invocation that got killed
+EMAIL_SENDING_LEASE = datetime.timedelta(minutes=int(os.getenv("EMAIL_SENDING_LEASE_MINUTES", 10)))
+# a send is only started when a full SMTP timeout still fits in the budget
+SEND_RESERVE_SECONDS = SMTP_TIMEOUT + 1
+if EMAIL_DRAIN_TIME_BUDGET < SEND_RESERVE_SECONDS:
+    logger.error("EMAIL_DRAIN_TIME_BUDGET_SECONDS (%.0f) is below the %.0fs a send needs, no email will be sent",
+                 EMAIL_DRAIN_TIME_BUDGET, SEND_RESERVE_SECONDS)
+
+
+def _release_stale_claims(db: Session, since: datetime.datetime) -> int:
+    """Queue emails again whose SENDING claim outlived the lease."""
+    cutoff = datetime.datetime.now(datetime.timezone.utc) - EMAIL_SENDING_LEASE
+    result = db.execute(
+        update(EmailLog)
+        .where(
+            EmailLog.status == EmailStatus.SENDING,
+            EmailLog.created_at >= since,
+            func.coalesce(EmailLog.updated_at, EmailLog.created_at) < cutoff,
+        )
+        .values(status=EmailStatus.QUEUED)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if result.rowcount:
+        logger.warning("Cronjob: Queued %d emails again that were left SENDING", result.rowcount)
+    return result.rowcount
+
+
+def _claim_chunk(db: Session, since: datetime.datetime, size: int, attempted: set[int]) -> list[tuple[int, EmailLog]]:
+    """Mark the oldest queued emails SENDING and return them with their ids.
+    Rows claimed by a concurrent run and emails already attempted in this run are skipped."""
+    query = db.query(EmailLog).filter(EmailLog.status == EmailStatus.QUEUED, EmailLog.created_at >= since)
+    if attempted:
+        query = query.filter(EmailLog.id.not_in(attempted))
+    emails = (
+        query.order_by(EmailLog.created_at, EmailLog.id)
+        .limit(size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    claimed = []
+    for email in emails:
+        email.status = EmailStatus.SENDING
+        claimed.append((email.id, email))
+    db.commit()
+    return claimed
+
+
+def _release_claims(db: Session, email_ids: list[int]):
+    """Put claimed emails that were not sent back in the queue."""
+    if not email_ids:
+        return
+    db.execute(
+        update(EmailLog)
+        .where(EmailLog.id.in_(email_ids), EmailLog.status == EmailStatus.SENDING)
+        .values(status=EmailStatus.QUEUED)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def _count_queued(db: Session, since: datetime.datetime) -> int:
+    return db.query(func.count()).select_from(EmailLog).filter(
+        EmailLog.status == EmailStatus.QUEUED,
+        EmailLog.created_at >= since,
+    ).scalar()
+
+
+async def send_queued_emails(db: Session = None, time_budget: float | None = None) -> dict:
+    """Send queued emails, oldest first, until the queue is empty or the time budget is spent.
+    Returns a progress report; `more_work` tells whether another invocation is needed."""
+    deadline = time.monotonic() + (EMAIL_DRAIN_TIME_BUDGET if time_budget is None else time_budget)
     close_db = False
     if db is None:
-        db = get_db_session()
+        db = SessionLocal()
         close_db = True
+    report = {
+        "processed": 0, "sent": 0, "failed": 0, "requeued": 0, "remaining": 0, "more_work": False, "stopped": "empty"
+    }
+    attempted: set[int] = set()
     try:
         email_service = EmailService(db)
-        queued_emails = db.query(EmailLog).filter(EmailLog.status == EmailStatus.QUEUED).all()
+        since = datetime.datetime.now(datetime.timezone.utc) - QUEUED_LOOKBACK
+        _release_stale_claims(db, since)
 
-        logger.info("Cronjob: Found %d queued emails to send", len(queued_emails))
+        while report["stopped"] == "empty":
+            if deadline - time.monotonic() < SEND_RESERVE_SECONDS:
+                report["stopped"] = "deadline"
+                break
+            claimed = _claim_chunk(db, since, EMAIL_DRAIN_CHUNK_SIZE, attempted)
+            if not claimed:
+                break
+            logger.info("Cronjob: Claimed %d queued emails", len(claimed))
+            claimed_ids = [email_id for email_id, _ in claimed]
 
-        for email in queued_emails:
-            try:
-                logger.info("Cronjob: Sending queued email ID %d", email.id)
-                await email_service.send_email(email_log=email)
-                logger.info("Cronjob: Processed queued email ID %d", email.id)
-            except Exception as e:
-                logger.error("Cronjob: Failed to send queued email ID %d: %s", email.id, str(e))
+            for index, (email_id, email) in enumerate(claimed):
+                if deadline - time.monotonic() < SEND_RESERVE_SECONDS:
+                    report["stopped"] = "deadline"
+                    _release_claims(db, claimed_ids[index:])
+                    break
+                attempted.add(email_id)
+                try:
+                    logger.info("Cronjob: Sending queued email ID %d", email_id)
+                    await email_service.send_email(email_log=email)
+                    report["sent"] += 1
+                except exceptions.CircuitOpenException as e:
+                    # every following send would fail fast as well, leave the rest queued
+                    logger.warning("Cronjob: Stopping, SMTP circuit is open: %s", e)
+                    report["stopped"] = "circuit_open"
+                    _release_claims(db, claimed_ids[index:])
+                    break
+                except exceptions.EmailRateLimitException as e:
+                    logger.warning("Cronjob: Stopping, %s", e)
+                    report["stopped"] = "rate_limited"
+                    _release_claims(db, claimed_ids[index:])
+                    break
+                except exceptions.UpstreamUnavailableException:
+                    # send_email left it queued, it is retried by the next invocation
+                    report["requeued"] += 1
+                except Exception as e:
+                    report["failed"] += 1
+                    logger.error("Cronjob: Failed to send queued email ID %d: %s", email_id, str(e))
+                report["processed"] += 1
 
-        logger.info("Cronjob: Completed processing queued emails")
+        report["remaining"] = _count_queued(db, since)
+        report["more_work"] = report["remaining"] > 0
+        if report["stopped"] == "circuit_open":
+            # an SMTP outage must not look like a healthy drain
+            record_job_failure(db, EMAIL_DRAIN_JOB, "SMTP circuit is open")
+        else:
+            record_job_success(db, EMAIL_DRAIN_JOB)
+        logger.info("Cronjob: Drain finished: %s", report)
+        return report
     finally:
         if close_db:
             db.close()
 
 
 if __name__ == "__main__":
+    from configs.logs import setup_logging
+
+    setup_logging()
     asyncio.run(send_queued_emails())
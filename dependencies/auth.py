@@ -4,13 +4,13 @@ This module contains the auth dependencies like the token validation.
 
 import os
 import logging
-from fastapi import HTTPException, status, Header
+from fastapi import HTTPException, status, Header, Request
 from dotenv import load_dotenv
-import httpx
 from starlette.status import HTTP_400_BAD_REQUEST
+from services.captcha_service import siteverify, captcha_verifier, CAPTCHA_FALLBACK
+import exceptions as exceptions
 
 
-RECAPTCHA_SECRET_KEY = os.getenv("RECAPTCHA_SECRET_KEY", "your_secret_key_here")
 TOKEN = os.getenv("API_TOKEN")
 
 load_dotenv()
@@ -30,8 +30,8 @@ def validate_token(authorization: str = Header(None)):
     return True
 
 
-async def verify_captcha_token(authorization: str = Header(...)) -> str:
-    """Dependency that verifies reCAPTCHA token and returns it for logging."""
+def extract_captcha_token(authorization: str = Header(...)) -> str:
+    """Dependency that returns the reCAPTCHA token from the authorization header without verifying it."""
     if not authorization.startswith("Bearer "):
         raise HTTPException(
             status_code=HTTP_400_BAD_REQUEST,
@@ -39,14 +39,22 @@ async def verify_captcha_token(authorization: str = Header(...)) -> str:
         )
     logger.debug(f"Verifying captcha token from authorization header {authorization}")
     # get the token from the second part of the header Bearer.
-    captcha_token = authorization.split(" ")[1]
+    return authorization.split(" ")[1]
+
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://www.google.com/recaptcha/api/siteverify",
-            data={"secret": RECAPTCHA_SECRET_KEY, "response": captcha_token},
+async def verify_captcha_token(authorization: str = Header(...)) -> str:
+    """Dependency that verifies reCAPTCHA token and returns it for logging."""
+    captcha_token = extract_captcha_token(authorization)
+
+    try:
+        result = await siteverify(captcha_token)
+    except exceptions.UpstreamUnavailableException as e:
+        logger.error(f"Captcha verification unavailable: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Captcha verification is temporarily unavailable",
+            headers={"Retry-After": "30"},
         )
-    result = response.json()
     logger.info(f"Captcha verification response: {result}")
 
     if not result.get("success"):
@@ -56,3 +64,20 @@ async def verify_captcha_token(authorization: str = Header(...)) -> str:
         )
 
     return captcha_token
+
+
+async def submission_captcha_token(request: Request, authorization: str = Header(...)) -> str:
+    """Dependency for form submissions: in deferred captcha mode the token is verified after the form is stored,
+    otherwise it is verified before. The decision is kept in `request.state.captcha_deferred`."""
+    request.state.captcha_deferred = captcha_verifier.deferred_enabled()
+    if request.state.captcha_deferred:
+        return extract_captcha_token(authorization)
+    try:
+        return await verify_captcha_token(authorization)
+    except HTTPException as e:
+        if e.status_code != status.HTTP_503_SERVICE_UNAVAILABLE or CAPTCHA_FALLBACK != "accept_and_flag":
+            raise
+        # Google is unavailable: accept the submission but flag it as unverified
+        logger.warning("Accepting submission with unverified captcha while verification is unavailable")
+        request.state.captcha_deferred = True
+        return extract_captcha_token(authorization)
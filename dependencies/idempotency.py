@@ -0,0 +1,29 @@
+"""
+This module contains the duplicate submission dependency. It runs before the captcha verification so a
+double click or a network retry (which reuses an already spent captcha token) gets the id and status of the original
+form back. Nothing more is returned, the request did not prove it is the submitter.
+"""
+
+import datetime
+import logging
+from fastapi import Depends, Header
+from sqlalchemy.orm import Session
+from configs.db import get_db
+from schemas.forms import ZaansrechtFormCreate
+from services.idempotency_service import IdempotencyService, submission_keys
+import exceptions as exceptions
+
+logger = logging.getLogger(__name__)
+
+
+def reject_duplicate_submission(
+    form: ZaansrechtFormCreate,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db),
+) -> dict[str, datetime.timedelta]:
+    """Answer a repeated submission with the original form id, otherwise return the keys to store with the new form."""
+    keys = submission_keys(form.email, form.subject, form.description, idempotency_key)
+    original_form = IdempotencyService(db).find_original_form(keys)
+    if original_form is not None:
+        raise exceptions.DuplicateSubmissionException(original_form)
+    return keys
@@ -0,0 +1,20 @@
+"""
+This module contains the dependency that rejects form submissions from blocked IP ranges.
+It runs first on the submission routes, so blocked clients never reach the rate limiter, the captcha or the DB.
+"""
+
+import logging
+from fastapi import HTTPException, Request
+from starlette.status import HTTP_403_FORBIDDEN
+from dependencies.rate_limit import get_client_ip
+from services.ip_reputation_service import ip_blocklist
+
+logger = logging.getLogger(__name__)
+
+
+async def reject_blocked_ip(request: Request):
+    """Dependency that answers 403 when the client IP is in a blocked range, checked against the in-memory trie."""
+    client_ip = get_client_ip(request)
+    if await ip_blocklist.is_blocked(client_ip):
+        logger.warning("Rejected submission from blocked client %s", client_ip)
+        raise HTTPException(status_code=HTTP_403_FORBIDDEN, detail="Forbidden")
@@ -0,0 +1,181 @@
+"""
+This module contains the per client IP admission control that runs in front of the captcha verification.
+It is a sliding window rate limiter with an in-process backend (default) and a Postgres backend
+that shares the counters between replicas.
+"""
+
+import os
+import math
+import ipaddress
+import time
+import random
+import logging
+import threading
+from collections import deque
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from starlette.status import HTTP_429_TOO_MANY_REQUESTS
+from sqlalchemy.sql import text
+from dotenv import load_dotenv
+from configs.db import SessionLocal
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory | postgres
+RATE_LIMIT_MAX_REQUESTS = int(os.getenv("RATE_LIMIT_MAX_REQUESTS", 5))
+RATE_LIMIT_WINDOW_SECONDS = int(os.getenv("RATE_LIMIT_WINDOW_SECONDS", 60))
+# socket peers whose X-Real-IP / X-Forwarded-For headers are believed, e.g. the address of the nginx container
+TRUSTED_PROXIES = tuple(
+    ipaddress.ip_network(network.strip())
+    for network in os.getenv("TRUSTED_PROXIES", "127.0.0.1/32,::1/128").split(",")
+    if network.strip()
+)
+
+
+def is_trusted_proxy(host: str | None) -> bool:
+    try:
+        address = ipaddress.ip_address((host or "").strip())
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+
+def get_client_ip(request: Request) -> str:
+    """Return the client IP. Any client can send X-Real-IP and X-Forwarded-For, so they are only used when the
+    socket peer is a trusted proxy; otherwise the peer itself is the client."""
+    peer = request.client.host if request.client else None
+    if peer is None:
+        return "unknown"
+    if not is_trusted_proxy(peer):
+        return peer
+    real_ip = request.headers.get("x-real-ip")
+    if real_ip:
+        return real_ip.strip()
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if forwarded_for:
+        # the hops on the right were appended by our proxies, the first untrusted one from the right is the client
+        for hop in reversed([hop.strip() for hop in forwarded_for.split(",") if hop.strip()]):
+            if not is_trusted_proxy(hop):
+                return hop
+    return peer
+
+
+class InMemoryRateLimiter:
+    """Sliding log per key, only keeps the timestamps of the last `max_requests` admitted requests."""
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self, max_requests: int, window_seconds: int):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self._hits: dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    async def hit(self, key: str) -> float:
+        """Register a request for `key`. Returns 0 when admitted, otherwise the seconds until a retry is allowed."""
+        return self._hit(key, time.monotonic())
+
+    def _hit(self, key: str, now: float) -> float:
+        with self._lock:
+            self._calls += 1
+            if self._calls % self.SWEEP_EVERY == 0:
+                self._sweep(now)
+
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque(maxlen=self.max_requests)
+            if len(hits) == self.max_requests and now - hits[0] < self.window_seconds:
+                return self.window_seconds - (now - hits[0])
+            hits.append(now)
+            return 0
+
+    def _sweep(self, now: float):
+        """Drop the keys without hits inside the window so memory stays bounded."""
+        expired = [key for key, hits in self._hits.items() if not hits or now - hits[-1] >= self.window_seconds]
+        for key in expired:
+            del self._hits[key]
+
+
+class PostgresRateLimiter:
+    """Sliding window counter on top of fixed windows in the rate_limit_counters table.
+    Rejections are remembered locally until they expire, so a flood costs one query per key per window."""
+
+    PURGE_PROBABILITY = 0.001
+    MAX_BLOCKED_KEYS = 10000
+
+    def __init__(self, max_requests: int, window_seconds: int):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self._blocked_until: dict[str, float] = {}
+
+    async def hit(self, key: str) -> float:
+        """Register a request for `key`. Returns 0 when admitted, otherwise the seconds until a retry is allowed."""
+        now = time.time()
+        blocked_until = self._blocked_until.get(key)
+        if blocked_until is not None:
+            if blocked_until > now:
+                return blocked_until - now
+            del self._blocked_until[key]
+
+        retry_after = await run_in_threadpool(self._hit, key, now)
+        if retry_after:
+            if len(self._blocked_until) >= self.MAX_BLOCKED_KEYS:
+                self._blocked_until = {k: until for k, until in self._blocked_until.items() if until > now}
+            self._blocked_until[key] = now + retry_after
+        return retry_after
+
+    def _hit(self, key: str, now: float) -> float:
+        window_start = int(now // self.window_seconds) * self.window_seconds
+        elapsed = now - window_start
+        db = SessionLocal()
+        try:
+            current_hits, previous_hits = db.execute(
+                text(
+                    "WITH current AS ("
+                    " INSERT INTO rate_limit_counters (key, window_start, hits) VALUES (:key, :window_start, 1)"
+                    " ON CONFLICT (key, window_start) DO UPDATE SET hits = rate_limit_counters.hits + 1"
+                    " RETURNING hits"
+                    ") SELECT current.hits, COALESCE(("
+                    " SELECT hits FROM rate_limit_counters WHERE key = :key AND window_start = :previous_start"
+                    "), 0) FROM current"
+                ),
+                {"key": key, "window_start": window_start, "previous_start": window_start - self.window_seconds},
+            ).one()
+            if random.random() < self.PURGE_PROBABILITY:
+                db.execute(
+                    text("DELETE FROM rate_limit_counters WHERE window_start < :cutoff"),
+                    {"cutoff": window_start - self.window_seconds},
+                )
+            db.commit()
+        finally:
+            db.close()
+
+        # weight the previous window by the part of it that still overlaps the sliding window
+        estimated = previous_hits * (1 - elapsed / self.window_seconds) + current_hits
+        if estimated <= self.max_requests:
+            return 0
+        return self.window_seconds - elapsed
+
+
+def _create_rate_limiter():
+    if RATE_LIMIT_BACKEND == "postgres":
+        return PostgresRateLimiter(RATE_LIMIT_MAX_REQUESTS, RATE_LIMIT_WINDOW_SECONDS)
+    return InMemoryRateLimiter(RATE_LIMIT_MAX_REQUESTS, RATE_LIMIT_WINDOW_SECONDS)
+
+
+rate_limiter = _create_rate_limiter()
+
+
+async def limit_by_client_ip(request: Request):
+    """Dependency that rejects clients exceeding the submission rate with a 429 before any upstream or DB work."""
+    client_ip = get_client_ip(request)
+    retry_after = await rate_limiter.hit(client_ip)
+    if retry_after:
+        logger.warning("Rate limit exceeded for client %s, retry after %.1fs", client_ip, retry_after)
+        raise HTTPException(
+            status_code=HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
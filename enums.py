@@ -11,4 +11,11 @@ class FormStatus(str, Enum):
     NEW = "NEW"
     IN_PROGRESS = "IN_PROGRESS"
     VIEWED = "VIEWED"
-    ARCHIVED = "ARCHIVED"
\ No newline at end of file
+    ARCHIVED = "ARCHIVED"
+    PENDING_VERIFICATION = "PENDING_VERIFICATION"  # stored before the captcha was verified
+    QUARANTINED = "QUARANTINED"  # captcha verification failed
+
+
+class LiveEventTopic(str, Enum):
+    FORM = "form"
+    EMAIL = "email"
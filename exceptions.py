@@ -7,6 +7,32 @@ class EmailSendException(Exception):
     """Exception raised when email sending fails."""
     pass
 
+class EmailQueueFullException(Exception):
+    """Exception raised when the email log write buffer can not take more rows."""
+    pass
+
 class DatabaseException(Exception):
     """Exception raised for database related errors."""
     pass
+
+class InvalidStatusTransitionException(Exception):
+    """Exception raised when a form status change is not an allowed transition."""
+    pass
+
+class DuplicateSubmissionException(Exception):
+    """Exception raised when a form submission repeats an earlier one. It carries the id and status of the original form."""
+    def __init__(self, form: dict):
+        super().__init__("Duplicate form submission")
+        self.form = form
+
+class UpstreamUnavailableException(Exception):
+    """Exception raised when an upstream service (reCAPTCHA, SMTP) fails or exceeds its latency budget."""
+    pass
+
+class CircuitOpenException(UpstreamUnavailableException):
+    """Exception raised when a call is refused because the circuit breaker of the upstream is open."""
+    pass
+
+class TooManySubscribersException(Exception):
+    """Exception raised when a process already serves the maximum number of live event streams."""
+    pass
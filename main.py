@@ -1,18 +1,65 @@
 # app/main.py
 import logging
-from fastapi import FastAPI, APIRouter
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, APIRouter, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from configs.logs import setup_logging
-from routers import email, form
+from configs.db import engine
+from configs.replicas import replica_router
+from configs.http_client import start_http_client, close_http_client
+from routers import email, events, form, ip_reputation, profiling
+from services.email_log_writer import email_log_writer
+from services.health_service import readiness_monitor
+from services.captcha_service import captcha_verifier
+from services.ip_reputation_service import ip_blocklist
+from services.live_events_service import live_events
+from middlewares.load_shedding import LoadSheddingMiddleware
+from middlewares.profiling import ProfilingMiddleware, PROFILING_MODE
+from middlewares.query_stats import QueryStatsMiddleware
+import exceptions as exceptions
 
 
 # Setup logging
 setup_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="R2D2 API", version="0.0.3")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the per process shared resources: start them on startup, flush and close them on shutdown."""
+    start_http_client()
+    email_log_writer.start()
+    readiness_monitor.start()
+    captcha_verifier.start()
+    ip_blocklist.start()
+    replica_router.start()
+    yield
+    await replica_router.stop()
+    await live_events.stop()
+    await ip_blocklist.stop()
+    await captcha_verifier.stop()
+    await readiness_monitor.stop()
+    await email_log_writer.stop()
+    await close_http_client()
+    engine.dispose()
+    replica_router.dispose()
 
 
+app = FastAPI(title="R2D2 API", version="0.0.3", lifespan=lifespan)
+
+
+# Count the SQL statements of every request and warn about possible N+1 patterns
+app.add_middleware(QueryStatsMiddleware)
+
+# Profile sampled requests, not installed at all when profiling is off. Inside load shedding, so shed requests are
+# not profiled; it wraps the query statistics
+if PROFILING_MODE != "off":
+    app.add_middleware(ProfilingMiddleware)
+
+# Shed load when the DB pool is saturated. Added before CORS so rejections still carry the CORS headers.
+# The live event streams share one listener connection and stay open, they must not hold a slot
+app.add_middleware(LoadSheddingMiddleware, exempt_paths=("/api/v1/events",))
+
 # Include CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -27,9 +74,19 @@ api_router = APIRouter(prefix="/api/v1")
 # Include routers
 api_router.include_router(email.router, prefix="/email", tags=["Email"])
 api_router.include_router(form.router, prefix="/forms", tags=["Forms"])
+api_router.include_router(ip_reputation.router, prefix="/ip-reputation", tags=["IP reputation"])
+api_router.include_router(profiling.router, prefix="/profiling", tags=["Profiling"])
+api_router.include_router(events.router, prefix="/events", tags=["Live events"])
 
 app.include_router(api_router)
 
+
+@app.exception_handler(exceptions.DuplicateSubmissionException)
+async def duplicate_submission_handler(request: Request, exc: exceptions.DuplicateSubmissionException):
+    """Answer a repeated form submission with the id and status of the originally created form."""
+    logger.info("Replaying form ID %s for a duplicate submission", exc.form.get("id"))
+    return JSONResponse(status_code=200, content=exc.form, headers={"Idempotent-Replayed": "true"})
+
 @app.get("/")
 def read_root():
     return {"message": "Hello R2D2 services"}
@@ -37,3 +94,10 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness with database, pool and email queue details, served from the cached probe result."""
+    snapshot = await readiness_monitor.snapshot()
+    status_code = 503 if snapshot["status"] == "unavailable" else 200
+    return JSONResponse(status_code=status_code, content=snapshot)
@@ -0,0 +1,141 @@
+"""
+This module contains the admission control middleware that sheds load when the database pool is saturated.
+Requests that use the database need a slot; there are as many slots as connections in the pool. When all slots
+are taken a request waits in a short queue, write requests in front of reads, and is rejected with a 503 and
+Retry-After once the queue is full or its wait budget is spent. Latency stays bounded instead of requests piling
+up behind the 30s pool timeout.
+"""
+
+import os
+import asyncio
+import logging
+from collections import deque
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from configs.db import POOL_SIZE, MAX_OVERFLOW
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", POOL_SIZE + MAX_OVERFLOW))
+ADMISSION_WRITE_QUEUE_DEPTH = int(os.getenv("ADMISSION_WRITE_QUEUE_DEPTH", 30))
+ADMISSION_READ_QUEUE_DEPTH = int(os.getenv("ADMISSION_READ_QUEUE_DEPTH", 5))
+ADMISSION_WRITE_MAX_WAIT = float(os.getenv("ADMISSION_WRITE_MAX_WAIT_MS", 2000)) / 1000
+ADMISSION_READ_MAX_WAIT = float(os.getenv("ADMISSION_READ_MAX_WAIT_MS", 250)) / 1000
+ADMISSION_RETRY_AFTER = os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1")
+
+# only these paths use the database
+DB_PATH_PREFIX = "/api/v1"
+READ_METHODS = ("GET", "HEAD")
+
+
+class AdmissionController:
+    """Counting semaphore with two bounded wait queues; a freed slot goes to a waiting write first."""
+
+    def __init__(
+            self,
+            max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+            write_queue_depth: int = ADMISSION_WRITE_QUEUE_DEPTH,
+            read_queue_depth: int = ADMISSION_READ_QUEUE_DEPTH,
+            write_max_wait: float = ADMISSION_WRITE_MAX_WAIT,
+            read_max_wait: float = ADMISSION_READ_MAX_WAIT
+        ):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.rejected = 0
+        self._queues = {True: deque(), False: deque()}  # is_write -> waiting futures
+        self._depths = {True: write_queue_depth, False: read_queue_depth}
+        self._max_waits = {True: write_max_wait, False: read_max_wait}
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting_writes": len(self._queues[True]),
+            "waiting_reads": len(self._queues[False]),
+            "rejected": self.rejected,
+        }
+
+    async def acquire(self, is_write: bool) -> bool:
+        """Take a slot, waiting within the budget of the request type. Returns False when the request is shed."""
+        if self.in_flight < self.max_in_flight and not self._queues[True] and not self._queues[False]:
+            self.in_flight += 1
+            return True
+
+        queue = self._queues[is_write]
+        if len(queue) >= self._depths[is_write]:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        try:
+            # release() hands its slot over by resolving the future, in_flight is unchanged then
+            await asyncio.wait_for(waiter, self._max_waits[is_write])
+        except asyncio.TimeoutError:
+            self._discard(queue, waiter)
+            if waiter.done() and not waiter.cancelled():
+                # release() handed over the slot just before the timeout fired, use it instead of leaking it
+                return True
+            self.rejected += 1
+            return False
+        except asyncio.CancelledError:
+            self._discard(queue, waiter)
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        return True
+
+    def release(self):
+        """Give the slot to the next waiting write, then read, or free it."""
+        for is_write in (True, False):
+            queue = self._queues[is_write]
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    waiter.set_result(True)
+                    return
+        self.in_flight -= 1
+
+    @staticmethod
+    def _discard(queue: deque, waiter: asyncio.Future):
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            pass
+
+
+admission_controller = AdmissionController()
+
+
+class LoadSheddingMiddleware:
+    """Pure ASGI middleware, so admitted requests pay no extra task or body buffering."""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController = admission_controller,
+                 exempt_paths: tuple[str, ...] = ()):
+        self.app = app
+        self.controller = controller
+        self.exempt_paths = exempt_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith(DB_PATH_PREFIX) or path.startswith(self.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+
+        is_write = scope["method"] not in READ_METHODS
+        if not await self.controller.acquire(is_write):
+            logger.warning("Shedding %s %s: %s", scope["method"], path, self.controller.stats())
+            response = JSONResponse(
+                {"detail": "Service is overloaded, try again later"},
+                status_code=503,
+                headers={"Retry-After": ADMISSION_RETRY_AFTER},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
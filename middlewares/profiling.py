@@ -0,0 +1,201 @@
+"""
+This module contains the opt-in sampling profiler.
+With PROFILING_MODE=sample a fraction PROFILING_SAMPLE_RATE of the requests is profiled, with PROFILING_MODE=header
+(or sample) a request carrying `X-Profile: <API_TOKEN>` is always profiled. While a profiled request runs, a
+sampler thread records the Python stacks of the busy threads every PROFILING_INTERVAL_MS, which covers async routes
+on the event loop and sync routes in the threadpool alike. The stacks are aggregated per route template into
+collapsed-stack files (one line `frame;frame;frame count`) in PROFILING_DIR, ready for flamegraph.pl or speedscope.
+With PROFILING_MODE=off (default) the middleware is not installed at all.
+
+Samples are process wide: code of other requests running at the same time ends up in the profile as well.
+Only one request per process is profiled at a time to keep that noise and the overhead down.
+"""
+
+import os
+import re
+import asyncio
+import sys
+import time
+import random
+import secrets
+import logging
+import threading
+from collections import Counter
+from starlette.types import ASGIApp, Receive, Scope, Send
+from configs.logs import LOG_DIR
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+PROFILING_MODE = os.getenv("PROFILING_MODE", "off")  # off | header | sample
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0.01))
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL_MS", 5)) / 1000
+PROFILING_DIR = os.getenv("PROFILING_DIR", os.path.join(LOG_DIR, "profiles"))
+PROFILE_HEADER = b"x-profile"
+API_TOKEN = os.getenv("API_TOKEN")
+
+COLLAPSED_SUFFIX = ".collapsed"
+# leaf frames of threads that wait for work, their samples are not CPU time
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}:{code.co_firstlineno}".replace(";", ":")
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+def route_slug(route: str) -> str:
+    """File name part for a method and route template, e.g. GET /api/v1/forms/{form_id} -> GET_api_v1_forms_form_id."""
+    return re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+
+
+class SamplingProfiler:
+    """Samples the stacks of all busy threads while one request is profiled, and keeps the totals per route."""
+
+    def __init__(self, interval: float = PROFILING_INTERVAL, directory: str = PROFILING_DIR):
+        self.interval = interval
+        self.directory = directory
+        self._active = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._samples: Counter = Counter()
+        self._totals: dict[str, Counter] = {}
+
+    def start(self) -> bool:
+        """Start sampling for a request. Returns False when another request is being profiled."""
+        if not self._active.acquire(blocking=False):
+            return False
+        self._samples = Counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, route: str):
+        """Stop sampling and add the samples to the totals of the route."""
+        try:
+            self._stop.set()
+            self._thread.join()
+            totals = self._totals.setdefault(route, Counter())
+            totals.update(self._samples)
+            totals["__requests__"] += 1
+            self._write(route, totals)
+        except Exception as e:
+            logger.error("Storing the profile of %s failed: %s", route, e)
+        finally:
+            self._thread = None
+            self._active.release()
+
+    def _run(self):
+        own_thread = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread or _is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self._samples[";".join(reversed(stack))] += 1
+
+    def _write(self, route: str, totals: Counter):
+        """Rewrite the collapsed stacks of this process for the route; files of other workers are kept."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{route_slug(route)}.{os.getpid()}{COLLAPSED_SUFFIX}")
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as output:
+            output.write(f"# route: {route}\n# requests: {totals['__requests__']}\n")
+            for stack, count in totals.most_common():
+                if stack != "__requests__":
+                    output.write(f"{stack} {count}\n")
+        os.replace(temporary, path)
+
+
+profiler = SamplingProfiler()
+
+
+def list_profiles(directory: str = PROFILING_DIR) -> list[dict]:
+    """The profiled routes with their request and sample counts, summed over the worker processes."""
+    profiles: dict[str, dict] = {}
+    for stacks, route, requests in _read_profiles(directory):
+        profile = profiles.setdefault(route, {"route": route, "slug": route_slug(route), "requests": 0, "samples": 0})
+        profile["requests"] += requests
+        profile["samples"] += sum(stacks.values())
+    return sorted(profiles.values(), key=lambda profile: profile["samples"], reverse=True)
+
+
+def read_collapsed(slug: str, directory: str = PROFILING_DIR) -> str | None:
+    """The collapsed stacks of a route summed over the worker processes, or None when it was not profiled."""
+    merged: Counter = Counter()
+    found = False
+    for stacks, route, _ in _read_profiles(directory):
+        if route_slug(route) == slug:
+            merged.update(stacks)
+            found = True
+    if not found:
+        return None
+    return "".join(f"{stack} {count}\n" for stack, count in merged.most_common())
+
+
+def _read_profiles(directory: str):
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(COLLAPSED_SUFFIX):
+            continue
+        stacks: Counter = Counter()
+        route, requests = name, 0
+        with open(os.path.join(directory, name)) as profile:
+            for line in profile:
+                if line.startswith("# route: "):
+                    route = line[len("# route: "):].strip()
+                elif line.startswith("# requests: "):
+                    requests = int(line[len("# requests: "):])
+                elif line.strip():
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    stacks[stack] += int(count)
+        yield stacks, route, requests
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that profiles the selected requests. Only installed when PROFILING_MODE is not off."""
+
+    def __init__(self, app: ASGIApp, sampler: SamplingProfiler = profiler,
+                 mode: str = PROFILING_MODE, sample_rate: float = PROFILING_SAMPLE_RATE):
+        self.app = app
+        self.sampler = sampler
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.header_value = API_TOKEN.encode() if API_TOKEN else None
+
+    def _selected(self, scope: Scope) -> bool:
+        if self.header_value is not None:
+            # constant time, the header value is a secret token
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER and secrets.compare_digest(value, self.header_value):
+                    return True
+        return self.mode == "sample" and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self._selected(scope) or not self.sampler.start():
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # the router stores the matched route in the scope, profiles are kept per route template
+            route = f"{scope['method']} {getattr(scope.get('route'), 'path', 'unmatched')}"
+            await asyncio.to_thread(self.sampler.stop, route)
+            logger.info("Profiled %s in %.1fms", route, (time.perf_counter() - started) * 1000)
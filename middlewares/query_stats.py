@@ -0,0 +1,43 @@
+"""
+This module contains the middleware that keeps the SQL statement statistics of every request.
+It logs the number of statements and the DB time per request and warns about statements repeated often enough
+to be a possible N+1, e.g. lazy loads of a relationship in a loop.
+"""
+
+import time
+import logging
+from starlette.types import ASGIApp, Receive, Scope, Send
+from configs.query_stats import QueryStats, current_query_stats
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware that gives every request its own QueryStats."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_query_stats.reset(token)
+            if stats.count:
+                self._report(scope, stats, time.perf_counter() - started)
+
+    @staticmethod
+    def _report(scope: Scope, stats: QueryStats, elapsed: float):
+        route = getattr(scope.get("route"), "path", scope["path"])
+        logger.debug("%s %s: %d queries, %.1fms of %.1fms in the database",
+                     scope["method"], route, stats.count, stats.duration_ms, elapsed * 1000)
+        for statement, count in stats.repeated():
+            logger.warning("Possible N+1 in %s %s: statement executed %d times: %s",
+                           scope["method"], route, count, statement)
@@ -0,0 +1,324 @@
+"""
+Helpers for Alembic revisions that touch large, busy tables like email_logs and form_submission_log.
+They run outside the migration transaction, so each statement holds its locks for as short as possible:
+- DDL runs with a lock_timeout and is retried when it could not get its lock. A DDL statement waiting for its lock
+  queues every other query on the table behind it, a short timeout bounds that stall.
+- Indexes are built with CREATE INDEX CONCURRENTLY. On partitioned tables that is done per partition and the
+  partition indexes are attached to an index created ON ONLY the parent.
+- Backfills update the rows in key ranges, each range in its own short transaction.
+- Copy triggers keep a new column filled for old app instances during an expand/contract change.
+
+Use them with MIGRATION_MODE=lock_safe (see alembic/env.py) so every revision runs in its own transaction.
+
+    from migration_helpers import add_column, create_index_concurrently, backfill_in_batches
+"""
+import logging
+import os
+import time
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger("alembic.migration_helpers")
+
+MIGRATION_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "3s")
+MIGRATION_STATEMENT_TIMEOUT = os.getenv("MIGRATION_STATEMENT_TIMEOUT", "0")  # 0 disables it, e.g. for index builds
+MIGRATION_LOCK_RETRIES = int(os.getenv("MIGRATION_LOCK_RETRIES", 10))
+MIGRATION_RETRY_DELAY = float(os.getenv("MIGRATION_RETRY_DELAY_SECONDS", 1))
+
+LOCK_NOT_AVAILABLE = "55P03"
+SET_TIMEOUTS = (
+    "SELECT set_config('lock_timeout', :lock_timeout, false), set_config('statement_timeout', :statement_timeout, false)"
+)
+
+
+def _is_lock_timeout(error: DBAPIError) -> bool:
+    return getattr(error.orig, "pgcode", None) == LOCK_NOT_AVAILABLE
+
+
+def _guarded(step, lock_timeout: str, statement_timeout: str, retries: int, description: str):
+    """Run `step()` with the timeouts set, retrying when its lock was not granted. Needs an autocommit block."""
+    bind = op.get_bind()
+    previous = bind.execute(sa.text("SELECT current_setting('lock_timeout'), current_setting('statement_timeout')")).one()
+    bind.execute(sa.text(SET_TIMEOUTS), {"lock_timeout": lock_timeout, "statement_timeout": statement_timeout})
+    try:
+        for attempt in range(1, retries + 1):
+            try:
+                if callable(step):
+                    return step()
+                return bind.execute(sa.text(step))
+            except DBAPIError as e:
+                if not _is_lock_timeout(e) or attempt == retries:
+                    raise
+                delay = MIGRATION_RETRY_DELAY * 2 ** (attempt - 1)
+                logger.warning("%s could not get its lock within %s (attempt %d/%d), retrying in %.1fs",
+                               description, lock_timeout, attempt, retries, delay)
+                time.sleep(delay)
+    finally:
+        bind.execute(sa.text(SET_TIMEOUTS), {"lock_timeout": previous[0], "statement_timeout": previous[1]})
+
+
+def run_guarded(
+        step,
+        lock_timeout: str = MIGRATION_LOCK_TIMEOUT,
+        statement_timeout: str = MIGRATION_STATEMENT_TIMEOUT,
+        retries: int = MIGRATION_LOCK_RETRIES,
+        description: str = "migration step",
+    ):
+    """Run `step()` outside the migration transaction with lock and statement timeouts, retrying when its lock was
+    not granted. `step` is a SQL string or a callable issuing alembic operations; every statement commits on its own."""
+    with op.get_context().autocommit_block():
+        return _guarded(step, lock_timeout, statement_timeout, retries, description)
+
+
+def add_column(table_name: str, column: sa.Column, **kw):
+    """Add a column under the lock guard. Keep it nullable or with a constant default so no rewrite is needed,
+    then fill it with backfill_in_batches."""
+    run_guarded(lambda: op.add_column(table_name, column, **kw), description=f"ADD COLUMN {table_name}.{column.name}")
+
+
+def drop_column(table_name: str, column_name: str, **kw):
+    run_guarded(lambda: op.drop_column(table_name, column_name, **kw), description=f"DROP COLUMN {table_name}.{column_name}")
+
+
+def _partitions(table_name: str) -> list[str]:
+    return op.get_bind().execute(
+        sa.text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table ORDER BY child.relname"
+        ),
+        {"table": table_name},
+    ).scalars().all()
+
+
+def _is_partitioned(table_name: str) -> bool:
+    return bool(op.get_bind().execute(
+        sa.text("SELECT 1 FROM pg_class WHERE relname = :table AND relkind = 'p'"), {"table": table_name}
+    ).scalar())
+
+
+def _create_index_statement(index_name: str, table_name: str, columns: list[str], only: bool = False, **kw):
+    """CREATE INDEX IF NOT EXISTS as compiled by SQLAlchemy, optionally ON ONLY the (partitioned) table."""
+    table = sa.Table(table_name, sa.MetaData(), *(sa.Column(column, sa.types.NullType) for column in columns))
+    index = sa.Index(index_name, *(table.c[column] for column in columns), **kw)
+    statement = str(sa.schema.CreateIndex(index, if_not_exists=True).compile(dialect=op.get_bind().dialect))
+    if only:
+        statement = statement.replace(f" ON {table_name} ", f" ON ONLY {table_name} ", 1)
+    return statement
+
+
+def _build_index_concurrently(index_name: str, table_name: str, columns: list[str], **kw):
+    statement = _create_index_statement(index_name, table_name, columns, postgresql_concurrently=True, **kw)
+
+    def step():
+        bind = op.get_bind()
+        # a build that failed or timed out leaves an invalid index that IF NOT EXISTS would keep
+        invalid = bind.execute(
+            sa.text(
+                "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                "WHERE pg_class.relname = :index AND NOT pg_index.indisvalid"
+            ),
+            {"index": index_name},
+        ).scalar()
+        if invalid:
+            logger.warning("Dropping invalid index %s left by an earlier build", index_name)
+            bind.execute(sa.text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}"'))
+        bind.execute(sa.text(statement))
+
+    _guarded(step, MIGRATION_LOCK_TIMEOUT, MIGRATION_STATEMENT_TIMEOUT, MIGRATION_LOCK_RETRIES, f"CREATE INDEX {index_name}")
+
+
+def create_index_concurrently(index_name: str, table_name: str, columns: list[str], **kw):
+    """Build an index on the named columns without blocking writes. Accepts the dialect keyword arguments of
+    op.create_index (e.g. postgresql_using, postgresql_ops). Partitioned tables get an index per partition,
+    attached to the index of the parent."""
+    with op.get_context().autocommit_block():
+        if not _is_partitioned(table_name):
+            _build_index_concurrently(index_name, table_name, columns, **kw)
+            return
+
+        # an index ON ONLY the parent is created without scanning and stays invalid until every partition has its
+        # index attached. Partitions created later get the index from the parent.
+        _guarded(
+            _create_index_statement(index_name, table_name, columns, only=True, **kw),
+            MIGRATION_LOCK_TIMEOUT, MIGRATION_STATEMENT_TIMEOUT, MIGRATION_LOCK_RETRIES,
+            f"CREATE INDEX {index_name} ON ONLY {table_name}",
+        )
+        attached = set(op.get_bind().execute(
+            sa.text("SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = CAST(:index AS regclass)"),
+            {"index": index_name},
+        ).scalars().all())
+        for partition in _partitions(table_name):
+            partition_index = f"{partition}_{index_name}"[:63]
+            if partition_index in attached:
+                continue
+            logger.info("Building index %s on partition %s", partition_index, partition)
+            _build_index_concurrently(partition_index, partition, columns, **kw)
+            _guarded(
+                f'ALTER INDEX "{index_name}" ATTACH PARTITION "{partition_index}"',
+                MIGRATION_LOCK_TIMEOUT, MIGRATION_STATEMENT_TIMEOUT, MIGRATION_LOCK_RETRIES,
+                f"ATTACH {partition_index}",
+            )
+
+
+def drop_index_concurrently(index_name: str, table_name: str, **kw):
+    """Drop an index without blocking writes. An index of a partitioned table can not be dropped concurrently,
+    it is dropped under the lock guard instead."""
+    with op.get_context().autocommit_block():
+        concurrently = not _is_partitioned(table_name)
+        _guarded(
+            lambda: op.drop_index(index_name, table_name=table_name, postgresql_concurrently=concurrently, if_exists=True, **kw),
+            MIGRATION_LOCK_TIMEOUT, MIGRATION_STATEMENT_TIMEOUT, MIGRATION_LOCK_RETRIES,
+            f"DROP INDEX {index_name}",
+        )
+
+
+def add_check_constraint(constraint_name: str, table_name: str, condition: str):
+    """Add a CHECK constraint without holding a lock during the validation scan: it is added NOT VALID under the
+    lock guard and then validated, which does not block writes. On a partitioned table that is done per partition;
+    adding it to the parent afterwards merges with the validated partition constraints instead of scanning again."""
+    with op.get_context().autocommit_block():
+        tables = _partitions(table_name) if _is_partitioned(table_name) else []
+        for table in tables + ([] if tables else [table_name]):
+            _guarded(
+                f'ALTER TABLE "{table}" ADD CONSTRAINT "{constraint_name}" CHECK ({condition}) NOT VALID',
+                MIGRATION_LOCK_TIMEOUT, MIGRATION_STATEMENT_TIMEOUT, MIGRATION_LOCK_RETRIES,
+                f"ADD CONSTRAINT {constraint_name} ON {table}",
+            )
+            _guarded(
+                f'ALTER TABLE "{table}" VALIDATE CONSTRAINT "{constraint_name}"',
+                MIGRATION_LOCK_TIMEOUT, MIGRATION_STATEMENT_TIMEOUT, MIGRATION_LOCK_RETRIES,
+                f"VALIDATE CONSTRAINT {constraint_name} ON {table}",
+            )
+        if tables:
+            _guarded(
+                f'ALTER TABLE "{table_name}" ADD CONSTRAINT "{constraint_name}" CHECK ({condition})',
+                MIGRATION_LOCK_TIMEOUT, MIGRATION_STATEMENT_TIMEOUT, MIGRATION_LOCK_RETRIES,
+                f"ADD CONSTRAINT {constraint_name} ON {table_name}",
+            )
+
+
+def backfill_in_batches(
+        table_name: str,
+        set_clause: str,
+        where_clause: str = "TRUE",
+        key_column: str = "id",
+        batch_size: int = 5000,
+        pause: float = 0.05,
+        params: dict | None = None,
+    ) -> int:
+    """Run `UPDATE table SET <set_clause> WHERE <where_clause>` in ranges of `batch_size` keys, each range in its
+    own transaction, so only a few thousand rows are locked at a time. Make `where_clause` exclude rows that are
+    already done (e.g. `new_column IS NULL`) so an interrupted backfill resumes where it stopped."""
+    updated = 0
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        low, high = bind.execute(sa.text(f"SELECT min({key_column}), max({key_column}) FROM {table_name}")).one()
+        if low is None:
+            return 0
+        statement = sa.text(
+            f"UPDATE {table_name} SET {set_clause} "
+            f"WHERE {key_column} >= :batch_start AND {key_column} < :batch_end AND ({where_clause})"
+        )
+        for batch_start in range(low, high + 1, batch_size):
+            batch = {**(params or {}), "batch_start": batch_start, "batch_end": batch_start + batch_size}
+            updated += _guarded(
+                lambda: bind.execute(statement, batch),
+                MIGRATION_LOCK_TIMEOUT, MIGRATION_STATEMENT_TIMEOUT, MIGRATION_LOCK_RETRIES,
+                f"backfill of {table_name}",
+            ).rowcount
+            if pause:
+                time.sleep(pause)
+    logger.info("Backfilled %d rows of %s", updated, table_name)
+    return updated
+
+
+def rewrite_in_batches(
+        table_name: str,
+        match_columns: dict,
+        read_columns: list[str],
+        write_columns: dict,
+        transform,
+        where_clause: str = "TRUE",
+        key_column: str = "id",
+        batch_size: int = 1000,
+        pause: float = 0.05,
+    ) -> int:
+    """Rewrite rows whose new values are computed in Python (e.g. compression), a range of `batch_size` keys at a
+    time. Each range is read, passed row by row to `transform(row) -> {column: value}` and written back with a
+    single UPDATE ... FROM (VALUES ...), so every range is one short transaction.
+    `match_columns` and `write_columns` map column names to their SQLAlchemy types; the match columns identify a row
+    (include the partition key of partitioned tables). `where_clause` must exclude rewritten rows so an interrupted
+    rewrite resumes where it stopped."""
+    rewritten = 0
+    table = sa.table(table_name, *(sa.column(name, type_) for name, type_ in {**match_columns, **write_columns}.items()))
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        low, high = bind.execute(sa.text(f"SELECT min({key_column}), max({key_column}) FROM {table_name}")).one()
+        if low is None:
+            return 0
+        select_batch = sa.text(
+            f"SELECT {', '.join([*match_columns, *read_columns])} FROM {table_name} "
+            f"WHERE {key_column} >= :batch_start AND {key_column} < :batch_end AND ({where_clause})"
+        )
+        for batch_start in range(low, high + 1, batch_size):
+            rows = bind.execute(select_batch, {"batch_start": batch_start, "batch_end": batch_start + batch_size}).mappings().all()
+            if not rows:
+                continue
+            values = sa.values(
+                *(sa.column(name, type_) for name, type_ in {**match_columns, **write_columns}.items()),
+                name="new_values",
+            ).data([
+                tuple({**{name: row[name] for name in match_columns}, **transform(row)}[name]
+                      for name in [*match_columns, *write_columns])
+                for row in rows
+            ])
+            statement = (
+                sa.update(table)
+                .where(*(table.c[name] == values.c[name] for name in match_columns))
+                .values({name: values.c[name] for name in write_columns})
+            )
+            rewritten += _guarded(
+                lambda: bind.execute(statement),
+                MIGRATION_LOCK_TIMEOUT, MIGRATION_STATEMENT_TIMEOUT, MIGRATION_LOCK_RETRIES,
+                f"rewrite of {table_name}",
+            ).rowcount
+            if pause:
+                time.sleep(pause)
+    logger.info("Rewrote %d rows of %s", rewritten, table_name)
+    return rewritten
+
+
+def create_copy_trigger(table_name: str, column: str, new_column: str, expression: str):
+    """Keep `new_column` filled with `expression` (of NEW.<column>) for writers that only set `column`, e.g. app
+    instances of the release before an expand/contract change. Writers that set both columns are left alone."""
+    op.execute(f"""
+        CREATE FUNCTION {table_name}_{column}_copy() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.{column} IS NOT NULL AND (
+                (TG_OP = 'INSERT' AND NEW.{new_column} IS NULL) OR
+                (TG_OP = 'UPDATE' AND NEW.{column} IS DISTINCT FROM OLD.{column}
+                                  AND NEW.{new_column} IS NOT DISTINCT FROM OLD.{new_column})
+            ) THEN
+                NEW.{new_column} := {expression};
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # on a partitioned table the trigger is cloned to every partition
+    run_guarded(
+        f"CREATE TRIGGER {table_name}_{column}_copy BEFORE INSERT OR UPDATE OF {column} ON {table_name} "
+        f"FOR EACH ROW EXECUTE FUNCTION {table_name}_{column}_copy()",
+        description=f"CREATE TRIGGER {table_name}_{column}_copy",
+    )
+
+
+def drop_copy_trigger(table_name: str, column: str):
+    run_guarded(
+        f"DROP TRIGGER IF EXISTS {table_name}_{column}_copy ON {table_name}",
+        description=f"DROP TRIGGER {table_name}_{column}_copy",
+    )
+    op.execute(f"DROP FUNCTION IF EXISTS {table_name}_{column}_copy()")
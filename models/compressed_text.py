@@ -0,0 +1,59 @@
+# app/models/compressed_text.py
+"""
+Column type for large free text (email bodies, form descriptions) stored zlib-compressed in a bytea column.
+Values from TEXT_COMPRESSION_THRESHOLD_BYTES up are compressed when that makes them smaller. Postgres only
+compresses values above ~2kB by itself, and less well. The first byte tells how the rest is stored, and bytes
+0xFE/0xFF never start UTF-8 text, so values without a header are read as plain UTF-8.
+"""
+import os
+import zlib
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TEXT_COMPRESSION_THRESHOLD_BYTES = int(os.getenv("TEXT_COMPRESSION_THRESHOLD_BYTES", 256))
+TEXT_COMPRESSION_LEVEL = int(os.getenv("TEXT_COMPRESSION_LEVEL", 6))
+
+PLAIN = b"\xfe"
+ZLIB = b"\xff"
+
+
+def compress_text(value: str, threshold: int = TEXT_COMPRESSION_THRESHOLD_BYTES) -> bytes:
+    data = value.encode("utf-8")
+    if len(data) >= threshold:
+        compressed = zlib.compress(data, TEXT_COMPRESSION_LEVEL)
+        if len(compressed) < len(data):
+            return ZLIB + compressed
+    return PLAIN + data
+
+
+def decompress_text(value: bytes) -> str:
+    value = bytes(value)
+    if value[:1] == ZLIB:
+        return zlib.decompress(value[1:]).decode("utf-8")
+    if value[:1] == PLAIN:
+        return value[1:].decode("utf-8")
+    return value.decode("utf-8")
+
+
+class CompressedText(TypeDecorator):
+    """Text in Python, compressed bytea in the database."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, threshold: int = TEXT_COMPRESSION_THRESHOLD_BYTES):
+        super().__init__()
+        self.threshold = threshold
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_text(value, self.threshold)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decompress_text(value)
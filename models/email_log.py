@@ -1,19 +1,24 @@
 # app/models/email_log.py
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime
 from sqlalchemy.sql import func
 from configs.db import Base
+from models.compressed_text import CompressedText
 from enums import EmailStatus
 
 class EmailLog(Base):
     __tablename__ = "email_logs"
+    # Monthly range partitions on created_at, managed by crons/retention.py
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     sender = Column(String, nullable=False)
     receiver = Column(String, nullable=False)
     subject = Column(String, nullable=False)
-    body = Column(Text, nullable=True)
+    # the column keeps the name of the expand/contract migration that compressed it
+    body = Column("body_compressed", CompressedText, nullable=True)
     # Using Enum type for status
     status = Column(String, nullable=False, default=EmailStatus.QUEUED)
     error_message = Column(String, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # part of the primary key because it is the partition key
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
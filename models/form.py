@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index, CheckConstraint
 from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import INET, ARRAY
+from sqlalchemy.dialects.postgresql import INET, ARRAY, JSONB
 from configs.db import Base
+from models.compressed_text import CompressedText
 from sqlalchemy.orm import relationship
 from enums import FormStatus
 
@@ -21,7 +22,8 @@ class ZaansrechtForm(BaseForm):
 
     terms_accepted = Column(Boolean, nullable=False)
     telephone = Column(String, nullable=True)
-    description = Column(Text, nullable=True)
+    # the column keeps the name of the expand/contract migration that compressed it
+    description = Column("description_compressed", CompressedText, nullable=True)
     subject = Column(String, nullable=True)
     meeting_datetime = Column(DateTime(timezone=True), nullable=True)
     meeting_type = Column(String, nullable=True)  # e.g., 'in_person', 'virtual'
@@ -33,20 +35,55 @@ class ZaansrechtForm(BaseForm):
         cascade="all, delete-orphan"
     )
 
+# Shared table for all form types declared in schemas/form_definitions.py. The fields of a form type live in the
+# JSONB payload, so onboarding a new form does not need a new table or migration.
+class FormSubmission(Base):
+    __tablename__ = "form_submissions"
+    __table_args__ = (
+        Index("ix_form_submissions_form_type_status", "form_type", "status"),
+        # jsonb_path_ops supports the @> containment filters of the list endpoint with a smaller index
+        Index("ix_form_submissions_payload", "payload", postgresql_using="gin", postgresql_ops={"payload": "jsonb_path_ops"}),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    form_type = Column(String, nullable=False)
+    email = Column(String, nullable=True)
+    status = Column(String, nullable=False, default=FormStatus.NEW)
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    submission_logs = relationship(
+        "FormSubmissionLog",
+        back_populates="submission",
+        cascade="all, delete-orphan"
+    )
+
 # Addintional class that will save other data about the user logs like the ipaddress, user agent, referrer, etc. 
 # The form will be linked to this table via a foreign key.
 class FormSubmissionLog(Base):
     __tablename__ = "form_submission_log"
+    __table_args__ = (
+        # inet_ops supports the subnet containment filters (<<=) of the IP reputation statistics
+        Index("ix_form_submission_log_x_real_ip_gist", "x_real_ip", postgresql_using="gist", postgresql_ops={"x_real_ip": "inet_ops"}),
+        # a log belongs to exactly one ZaansrechtForm or one FormSubmission
+        CheckConstraint("num_nonnulls(form_id, submission_id) = 1", name="ck_form_submission_log_one_form"),
+        # Monthly range partitions on created_at, managed by crons/retention.py
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    # foreign key to ZaansrechtForm
-    form_id = Column(Integer, ForeignKey("zaansrecht_form.id"), nullable=False)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    # foreign key to ZaansrechtForm, or to FormSubmission for the generic form types
+    form_id = Column(Integer, ForeignKey("zaansrecht_form.id"), nullable=True)
+    submission_id = Column(Integer, ForeignKey("form_submissions.id"), nullable=True, index=True)
     user_agent = Column(String, nullable=True)
     referrer = Column(String, nullable=True)
     x_forwarded_for = Column(ARRAY(INET), nullable=True)
     x_real_ip = Column(INET, nullable=True, index=True)
     captcha_token = Column(String, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # part of the primary key because it is the partition key
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
 
-    # Reverse relationship
-    form = relationship("ZaansrechtForm", back_populates="submission_logs")
\ No newline at end of file
+    # Reverse relationships
+    form = relationship("ZaansrechtForm", back_populates="submission_logs")
+    submission = relationship("FormSubmission", back_populates="submission_logs")
\ No newline at end of file
@@ -0,0 +1,12 @@
+# app/models/idempotency.py
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from configs.db import Base
+
+
+class FormIdempotencyKey(Base):
+    """Maps an Idempotency-Key header or a submission content hash to the form it created."""
+    __tablename__ = "form_idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    form_id = Column(Integer, ForeignKey("zaansrecht_form.id", ondelete="CASCADE"), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
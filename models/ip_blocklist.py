@@ -0,0 +1,21 @@
+# app/models/ip_blocklist.py
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import CIDR
+from configs.db import Base
+
+
+class BlockedNetwork(Base):
+    """A CIDR range whose form submissions are rejected, loaded into the in-memory blocklist of every process."""
+    __tablename__ = "ip_blocklist"
+    __table_args__ = (
+        # inet_ops supports the containment operators (>>=, <<=) used to match addresses against ranges
+        Index("ix_ip_blocklist_network_gist", "network", postgresql_using="gist", postgresql_ops={"network": "inet_ops"}),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    network = Column(CIDR, nullable=False, unique=True)
+    reason = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # NULL blocks the range until it is removed
+    expires_at = Column(DateTime(timezone=True), nullable=True)
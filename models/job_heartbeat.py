@@ -0,0 +1,13 @@
+# app/models/job_heartbeat.py
+from sqlalchemy import Column, String, DateTime
+from configs.db import Base
+
+
+class JobHeartbeat(Base):
+    """Last successful and last failed run of a background job, e.g. the queued email drain."""
+    __tablename__ = "job_heartbeats"
+
+    name = Column(String, primary_key=True)
+    last_success_at = Column(DateTime(timezone=True), nullable=True)
+    last_failure_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(String, nullable=True)
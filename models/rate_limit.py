@@ -0,0 +1,13 @@
+# app/models/rate_limit.py
+from sqlalchemy import Column, Integer, String, BigInteger
+from configs.db import Base
+
+
+class RateLimitCounter(Base):
+    """Fixed window hit counters shared by all replicas for the sliding window rate limiter."""
+    __tablename__ = "rate_limit_counters"
+
+    key = Column(String, primary_key=True)
+    # start of the window in epoch seconds
+    window_start = Column(BigInteger, primary_key=True, index=True)
+    hits = Column(Integer, nullable=False, default=0)
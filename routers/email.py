@@ -1,13 +1,16 @@
 # app/routers/email.py
 import logging
-from fastapi import APIRouter, BackgroundTasks, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from configs.db import get_db
+from configs.replicas import get_read_db
 
 from services.emai_service import EmailService
+from schemas.emails import EmailLogSummary, EmailLogResponse, EmailLogListResponse
 from enums import EmailStatus
 from dependencies.auth import validate_token
-from crons.send_email import send_queued_emails
+from crons.send_email import send_queued_emails, EMAIL_DRAIN_TIME_BUDGET, SEND_RESERVE_SECONDS
+import exceptions as exceptions
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +18,6 @@ router = APIRouter()
 
 @router.post("/send-email")
 async def send_email_route(
-    background_tasks: BackgroundTasks,
     sender: str,
     subject: str,
     message: str,
@@ -25,40 +27,58 @@ async def send_email_route(
     """Endpoint to save an email asynchronously in the database with a pending status."""
     email_service = EmailService(db)
 
-    # Schedule the email saving task
-    background_tasks.add_task(
-        email_service.queue_new_email_log, sender, subject, message
-    )
+    # The group-commit writer batches the insert with other queued emails using its own session
+    try:
+        await email_service.enqueue_email_log(sender, subject, message)
+    except exceptions.EmailQueueFullException as e:
+        logger.warning("Email for %s not queued: %s", sender, e)
+        raise HTTPException(status_code=503, detail="Email queue is full, try again later", headers={"Retry-After": "1"})
 
     logger.info("Email saved for %s", sender)
 
     return {"status": "Email queued for sending"}
 
-@router.get("/sent-emails")
-async def get_sent_emails(db: Session = Depends(get_db), status: EmailStatus = EmailStatus.SENT):
+@router.get("/sent-emails", response_model=list[EmailLogSummary])
+async def get_sent_emails(db: Session = Depends(get_read_db), status: EmailStatus = EmailStatus.SENT):
+    """Retrieve the emails with a status, without their body."""
     email_service = EmailService(db)
     emails = email_service.get_sent_emails_by_status(status)
     return emails
 
 @router.get("/email-status/{email_id}")
-async def get_email_status(email_id: int, db: Session = Depends(get_db)):
+async def get_email_status(email_id: int, db: Session = Depends(get_read_db)):
     email_service = EmailService(db)
     status = email_service.get_email_status(email_id)
     return {"email_id": email_id, "status": status}
 
-@router.get("/all-emails")
-async def get_all_emails(db: Session = Depends(get_db)):
-    """Retrieve all emails."""
+@router.get("/all-emails", response_model=EmailLogListResponse)
+async def get_all_emails(db: Session = Depends(get_read_db)):
+    """Retrieve all emails, without their body."""
     email_service = EmailService(db)
     all_emails = email_service.get_all_emails()
     return {"all_emails": all_emails}
 
+@router.get("/emails/{email_id}", response_model=EmailLogResponse)
+async def get_email(email_id: int, db: Session = Depends(get_read_db)):
+    """Retrieve a single email including its body."""
+    email_service = EmailService(db)
+    email = email_service.get_email(email_id)
+    if email is None:
+        raise HTTPException(status_code=404, detail="Email not found")
+    return email
+
 
 # cronjob: to be run periodically to fetch pending emails, and send them
 @router.post("/cronjob-send-queued-emails")
-async def cronjob_send_queued_emails(request: Request, db: Session = Depends(get_db), authorization: str = Depends(validate_token)):
-    """Cronjob endpoint to send all queued emails."""
-    logger.info(f"Authorization header provided: {authorization}")
-    logger.info(f"All headers: {request.headers}")
-    # await send_queued_emails(db=db)
-    return {"status": "Processed queued emails"}
+async def cronjob_send_queued_emails(
+    request: Request,
+    db: Session = Depends(get_db),
+    authorization: str = Depends(validate_token),
+    # a smaller budget can not fit a single send and would report more_work forever
+    time_budget: float | None = Query(None, ge=SEND_RESERVE_SECONDS, le=EMAIL_DRAIN_TIME_BUDGET),
+):
+    """Cronjob endpoint to send queued emails, oldest first, for as long as the time budget allows.
+    The response tells whether another run is needed to empty the queue."""
+    logger.debug(f"All headers: {request.headers}")
+    report = await send_queued_emails(db=db, time_budget=time_budget)
+    return {"status": "Processed queued emails", **report}
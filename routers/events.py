@@ -0,0 +1,53 @@
+"""
+This module provides the Server-Sent Events feed of new forms and form and email status changes for the staff
+dashboards, instead of polling the list endpoints. All routes require the API token.
+"""
+
+import logging
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from dependencies.auth import validate_token
+from enums import LiveEventTopic
+from services.live_events_service import live_events, LIVE_EVENTS_HEARTBEAT_SECONDS, LIVE_EVENTS_RETRY_MS
+import exceptions as exceptions
+
+logger = logging.getLogger(__name__)
+router = APIRouter(dependencies=[Depends(validate_token)])
+
+
+@router.get("/", response_class=StreamingResponse)
+async def stream_events(
+    topics: list[LiveEventTopic] = Query(list(LiveEventTopic)),
+    last_event_id: str | None = Header(None),
+):
+    """Stream `form.created`, `form.status`, `email.created` and `email.status` events. A reconnecting client sends
+    Last-Event-ID to receive the events it missed, or a `reset` event when it should reload its lists instead."""
+    try:
+        subscriber, replay = live_events.subscribe(set(topics), last_event_id)
+    except exceptions.TooManySubscribersException as e:
+        logger.warning("Refusing live event stream: %s", e)
+        raise HTTPException(status_code=503, detail="Too many live event streams", headers={"Retry-After": "30"})
+
+    async def stream():
+        try:
+            yield f"retry: {LIVE_EVENTS_RETRY_MS}\n\n"
+            for message in replay:
+                yield message
+            while not subscriber.closed:
+                messages = await subscriber.next_messages(LIVE_EVENTS_HEARTBEAT_SECONDS)
+                # a comment line keeps proxies from closing an idle stream
+                yield "".join(messages) or ": heartbeat\n\n"
+        finally:
+            live_events.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stats")
+def get_live_event_stats():
+    """Listener state, subscriber count and replay buffer size of this worker process."""
+    return live_events.stats()
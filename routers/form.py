@@ -3,26 +3,54 @@ This module provides the routes for form handling, including creating new form s
 It leverages the FormService for business logic and database interactions.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Request
-from schemas.forms import ZaansrechtFormCreate, ZaansrechtFormResponse, FormStatusUpdate, FormListResponse
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from schemas.forms import (
+    ZaansrechtFormCreate,
+    ZaansrechtFormResponse,
+    ZaansrechtFormSummary,
+    FormStatusUpdate,
+    FormListResponse,
+    FormBulkStatusUpdate,
+    FormBulkStatusUpdateResponse,
+    FormSubmissionResponse,
+    FormSubmissionListResponse,
+)
+from schemas.form_definitions import FormDefinition, CompiledFormDefinition, get_form_definition, list_form_definitions
 from sqlalchemy.orm import Session
 from configs.db import get_db
-from dependencies.auth import verify_captcha_token
+from configs.replicas import get_read_db
+from dependencies.auth import submission_captcha_token
+from dependencies.rate_limit import limit_by_client_ip, get_client_ip
+from dependencies.ip_blocklist import reject_blocked_ip
+from dependencies.idempotency import reject_duplicate_submission
 from services.form_service import FormService, FormSubmissionLogService
+from services.idempotency_service import IdempotencyService
+from services.captcha_service import captcha_verifier
+from models.form import FormSubmission
 from enums import FormStatus
+import exceptions as exceptions
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.post("/zaansrecht", response_model=ZaansrechtFormResponse)
+# the blocklist and the rate limiter are route dependencies so they run before the captcha verification
+@router.post(
+    "/zaansrecht",
+    response_model=ZaansrechtFormResponse,
+    dependencies=[Depends(reject_blocked_ip), Depends(limit_by_client_ip)],
+)
 async def create_zaansrecht_form(
     request: Request,
     form: ZaansrechtFormCreate,
     db: Session = Depends(get_db),
-    captcha_token: str = Depends(verify_captcha_token)
+    # declared before the captcha so a retry with a spent captcha token is answered; it only reveals id and status
+    idempotency_keys: dict = Depends(reject_duplicate_submission),
+    captcha_token: str = Depends(submission_captcha_token)
 ):
-    """Create a new Zaansrecht form submission."""
+    """Create a new Zaansrecht form submission. Repeated submissions return the id and status of the original form."""
     logger.info("Creating Zaansrecht captcha_token %s", captcha_token[:5])
     logger.debug("Request details ====================")
     logger.debug(f"Method: {request.method}")
@@ -36,7 +64,13 @@ async def create_zaansrecht_form(
     try:
         # Create the form using the FormService and then log the submission details
         form_service = FormService(db)
-        created_form = form_service.create_zaansrecht_form(**form.model_dump())
+        # in deferred captcha mode the form is stored first and verified in the background
+        deferred_captcha = request.state.captcha_deferred
+        created_form = form_service.create_zaansrecht_form(
+            **form.model_dump(),
+            idempotency_keys=idempotency_keys,
+            status=FormStatus.PENDING_VERIFICATION if deferred_captcha else FormStatus.NEW,
+        )
         logger.info("Created Zaansrecht form with ID %d", created_form.id)
         if not created_form:
             raise HTTPException(status_code=500, detail="Failed to create form")
@@ -48,19 +82,25 @@ async def create_zaansrecht_form(
             user_agent=request.headers.get("user-agent"),
             referrer=request.headers.get("referer"),
             x_forwarded_for=request.headers.get("x-forwarded-for"),
-            x_real_ip=request.headers.get("x-real-ip"),
+            x_real_ip=get_client_ip(request),
             captcha_token=captcha_token
         )
         log_service.log_form_submission()
-        return created_form
+        if deferred_captcha:
+            captcha_verifier.submit(created_form.id, captcha_token)
+        response = ZaansrechtFormResponse.model_validate(created_form)
+        IdempotencyService(db).remember(created_form, idempotency_keys)
+        return response
+    except exceptions.DuplicateSubmissionException:
+        raise
     except Exception as e:
         logger.error("Error creating Zaansrecht form: %s", e)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 @router.get("/", response_model=FormListResponse)
-def get_forms(request: Request, db: Session = Depends(get_db), status: FormStatus|None = None):
-    """Retrieve all forms with a specific status or all forms if no status is provided."""
+def get_forms(request: Request, db: Session = Depends(get_read_db), status: FormStatus|None = None):
+    """Retrieve all forms with a specific status or all forms if no status is provided, without their description."""
     logger.info("Retrieving forms with status: %s", status)
     logger.debug("Request details ====================")
     logger.debug(f"Method: {request.method}")
@@ -71,14 +111,133 @@ def get_forms(request: Request, db: Session = Depends(get_db), status: FormStatu
     form_service = FormService(db)
     forms = form_service.get_forms_by_status_or_all(status)
     # convert to response model
-    forms = [ZaansrechtFormResponse.model_validate(form) for form in forms]
+    forms = [ZaansrechtFormSummary.model_validate(form) for form in forms]
     return FormListResponse(forms=forms)
 
+@router.put("/status", response_model=FormBulkStatusUpdateResponse)
+def bulk_update_form_status(status_update: FormBulkStatusUpdate, db: Session = Depends(get_db)):
+    """Update the status of many forms at once, selected by ids and/or their current status."""
+    form_service = FormService(db)
+    updated_forms = form_service.bulk_update_form_status(
+        status_update.new_status,
+        form_ids=status_update.form_ids,
+        status=status_update.status,
+        enforce_transitions=status_update.enforce_transitions,
+    )
+    return FormBulkStatusUpdateResponse(updated_count=len(updated_forms), forms=updated_forms)
+
 @router.put("/{form_id}/status", response_model=ZaansrechtFormResponse)
-def update_form_status(form_id: int, status_update: FormStatusUpdate, db: Session = Depends(get_db)):
+def update_form_status(
+    form_id: int,
+    status_update: FormStatusUpdate,
+    enforce_transitions: bool = False,
+    db: Session = Depends(get_db)
+):
     """Update the status of a specific form."""
     form_service = FormService(db)
-    updated_form = form_service.update_form_status(form_id, status_update.new_status)
+    try:
+        updated_form = form_service.update_form_status(form_id, status_update.new_status, enforce_transitions)
+    except exceptions.InvalidStatusTransitionException as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if not updated_form:
         raise HTTPException(status_code=404, detail="Form not found")
     return updated_form
+
+
+# Generic form engine: any form type registered in schemas/form_definitions.py
+def get_compiled_form_definition(form_type: str) -> CompiledFormDefinition:
+    """Dependency that resolves the cached definition of a form type."""
+    form_definition = get_form_definition(form_type)
+    if form_definition is None:
+        raise HTTPException(status_code=404, detail=f"Unknown form type {form_type}")
+    return form_definition
+
+@router.get("/definitions", response_model=list[FormDefinition])
+def get_form_definitions():
+    """List the registered form types and their fields."""
+    return list_form_definitions()
+
+@router.post(
+    "/submissions/{form_type}",
+    response_model=FormSubmissionResponse,
+    dependencies=[Depends(reject_blocked_ip), Depends(limit_by_client_ip)],
+)
+async def create_form_submission(
+    request: Request,
+    payload: dict = Body(...),
+    form_definition: CompiledFormDefinition = Depends(get_compiled_form_definition),
+    db: Session = Depends(get_db),
+    captcha_token: str = Depends(submission_captcha_token)
+):
+    """Create a submission for any registered form type."""
+    try:
+        validated_payload = form_definition.validate(payload)
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False, include_context=False)
+        ])
+
+    deferred_captcha = request.state.captcha_deferred
+    form_service = FormService(db)
+    submission = form_service.create_submission(
+        form_definition,
+        validated_payload,
+        status=FormStatus.PENDING_VERIFICATION if deferred_captcha else FormStatus.NEW,
+    )
+    FormSubmissionLogService(
+        db,
+        submission_id=submission.id,
+        user_agent=request.headers.get("user-agent"),
+        referrer=request.headers.get("referer"),
+        x_forwarded_for=request.headers.get("x-forwarded-for"),
+        x_real_ip=get_client_ip(request),
+        captcha_token=captcha_token
+    ).log_form_submission()
+    if deferred_captcha:
+        captcha_verifier.submit(submission.id, captcha_token, model=FormSubmission)
+    return submission
+
+@router.get("/submissions/{form_type}", response_model=FormSubmissionListResponse)
+def get_form_submissions(
+    request: Request,
+    form_definition: CompiledFormDefinition = Depends(get_compiled_form_definition),
+    db: Session = Depends(get_read_db),
+    status: FormStatus|None = None
+):
+    """Retrieve the submissions of a form type. Other query parameters filter on payload fields, e.g. ?meeting_type=virtual."""
+    filters = {key: value for key, value in request.query_params.items() if key != "status"}
+    try:
+        payload_filter = form_definition.parse_filters(filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    form_service = FormService(db)
+    submissions = form_service.get_submissions(form_definition.name, status, payload_filter)
+    return FormSubmissionListResponse(submissions=submissions)
+
+@router.put("/submissions/{submission_id}/status", response_model=FormSubmissionResponse)
+def update_form_submission_status(
+    submission_id: int,
+    status_update: FormStatusUpdate,
+    enforce_transitions: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Update the status of a submission of any form type."""
+    form_service = FormService(db)
+    try:
+        updated = form_service.update_submission_status(submission_id, status_update.new_status, enforce_transitions)
+    except exceptions.InvalidStatusTransitionException as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not updated:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    return updated
+
+
+# declared last so the fixed paths above (e.g. /definitions) are matched first
+@router.get("/{form_id}", response_model=ZaansrechtFormResponse)
+def get_form(form_id: int, db: Session = Depends(get_read_db)):
+    """Retrieve a single form including its description."""
+    form_service = FormService(db)
+    form = form_service.get_form(form_id)
+    if form is None:
+        raise HTTPException(status_code=404, detail="Form not found")
+    return form
@@ -0,0 +1,85 @@
+"""
+This module provides the routes to inspect the IP reputation of form submitters and to manage the blocklist.
+All routes require the API token.
+"""
+
+import datetime
+import ipaddress
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from configs.db import get_db
+from configs.replicas import get_read_db
+from dependencies.auth import validate_token
+from schemas.ip_reputation import (
+    IpStatistics,
+    SubnetStatistics,
+    BlockedNetworkCreate,
+    BlockedNetworkResponse,
+    NetworkSubmissionCount,
+)
+from services.ip_reputation_service import IpReputationService, IP_REPUTATION_WINDOW
+
+logger = logging.getLogger(__name__)
+router = APIRouter(dependencies=[Depends(validate_token)])
+
+DEFAULT_WINDOW_HOURS = int(IP_REPUTATION_WINDOW.total_seconds() // 3600)
+
+
+def parse_network(network: str) -> str:
+    """Normalize a CIDR range, host bits are not allowed."""
+    try:
+        return str(ipaddress.ip_network(network))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/ips", response_model=list[IpStatistics])
+def get_ip_statistics(
+    db: Session = Depends(get_read_db),
+    hours: int = Query(DEFAULT_WINDOW_HOURS, gt=0),
+    limit: int = Query(50, gt=0, le=1000),
+):
+    """Submissions per client address over the last hours, busiest first."""
+    return IpReputationService(db).ip_statistics(datetime.timedelta(hours=hours), limit)
+
+@router.get("/subnets", response_model=list[SubnetStatistics])
+def get_subnet_statistics(
+    db: Session = Depends(get_read_db),
+    hours: int = Query(DEFAULT_WINDOW_HOURS, gt=0),
+    limit: int = Query(50, gt=0, le=1000),
+    ipv4_prefix: int = Query(24, ge=8, le=32),
+    ipv6_prefix: int = Query(64, ge=16, le=128),
+):
+    """Submissions and distinct addresses per subnet over the last hours, busiest first."""
+    return IpReputationService(db).subnet_statistics(datetime.timedelta(hours=hours), limit, ipv4_prefix, ipv6_prefix)
+
+@router.get("/networks/submissions", response_model=NetworkSubmissionCount)
+def get_network_submission_count(
+    network: str,
+    db: Session = Depends(get_read_db),
+    hours: int = Query(DEFAULT_WINDOW_HOURS, gt=0),
+):
+    """Submissions from inside a CIDR range over the last hours, e.g. to check a range before blocking it."""
+    network = parse_network(network)
+    count = IpReputationService(db).network_submission_count(network, datetime.timedelta(hours=hours))
+    return NetworkSubmissionCount(network=network, submissions=count)
+
+@router.get("/blocklist", response_model=list[BlockedNetworkResponse])
+def get_blocklist(db: Session = Depends(get_db)):
+    """The blocked ranges, including expired ones."""
+    return IpReputationService(db).list_blocked_networks()
+
+@router.post("/blocklist", response_model=BlockedNetworkResponse)
+def block_network(blocked: BlockedNetworkCreate, db: Session = Depends(get_db)):
+    """Block a CIDR range. Every process applies it with its next blocklist refresh."""
+    network = parse_network(blocked.network)
+    return IpReputationService(db).block_network(network, blocked.reason, blocked.expires_at)
+
+@router.delete("/blocklist")
+def unblock_network(network: str, db: Session = Depends(get_db)):
+    """Remove a blocked range."""
+    network = parse_network(network)
+    if not IpReputationService(db).unblock_network(network):
+        raise HTTPException(status_code=404, detail="Network is not blocked")
+    return {"network": network, "status": "unblocked"}
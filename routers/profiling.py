@@ -0,0 +1,30 @@
+"""
+This module provides the routes to download the per route profiles of the sampling profiler.
+All routes require the API token.
+"""
+
+import logging
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from dependencies.auth import validate_token
+from middlewares.profiling import list_profiles, read_collapsed, PROFILING_MODE
+
+logger = logging.getLogger(__name__)
+router = APIRouter(dependencies=[Depends(validate_token)])
+
+
+@router.get("/")
+def get_profiles():
+    """The profiled routes of all worker processes with their request and sample counts."""
+    return {"mode": PROFILING_MODE, "profiles": list_profiles()}
+
+@router.get("/{slug}", response_class=PlainTextResponse)
+def download_profile(slug: str):
+    """Collapsed stacks of a route (slug from the list), to render with flamegraph.pl or speedscope."""
+    collapsed = read_collapsed(slug)
+    if collapsed is None:
+        raise HTTPException(status_code=404, detail="No profile for this route")
+    return PlainTextResponse(
+        collapsed,
+        headers={"Content-Disposition": f'attachment; filename="{slug}.collapsed"'},
+    )
@@ -0,0 +1,30 @@
+"""
+This module provides pydantic schemas for the email log endpoints.
+List endpoints return the summary without the email body; the full email is served by the detail endpoint.
+"""
+
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+from enums import EmailStatus
+
+class EmailLogSummary(BaseModel):
+    id: int
+    sender: str
+    receiver: str
+    subject: str
+    status: EmailStatus
+    error_message: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class EmailLogResponse(EmailLogSummary):
+    body: Optional[str] = None
+
+
+class EmailLogListResponse(BaseModel):
+    all_emails: list[EmailLogSummary]
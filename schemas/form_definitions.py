@@ -0,0 +1,120 @@
+"""
+This module provides the registry of form definitions for the generic form engine.
+Each form type declares its fields once; the pydantic model that validates its submissions is compiled when the
+definition is registered and reused for every request. Submissions of all types are stored in the shared
+form_submissions table with the validated fields as JSONB payload.
+"""
+
+from datetime import date, datetime
+from typing import Annotated, Any, Literal, Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, TypeAdapter, ValidationError, create_model
+
+FieldType = Literal["str", "text", "email", "bool", "int", "float", "date", "datetime"]
+
+FIELD_TYPES: dict[str, Any] = {
+    "str": str,
+    "text": str,
+    "email": EmailStr,
+    "bool": bool,
+    "int": int,
+    "float": float,
+    "date": date,
+    "datetime": datetime,
+}
+
+
+class FormField(BaseModel):
+    type: FieldType = "str"
+    required: bool = False
+    max_length: Optional[int] = None
+    description: Optional[str] = None
+
+
+class FormDefinition(BaseModel):
+    name: str
+    title: str
+    fields: dict[str, FormField]
+    # field holding the submitter's email, copied to its own indexed column
+    email_field: Optional[str] = None
+
+
+class CompiledFormDefinition:
+    """A registered definition with its submission model and filter adapters built once."""
+
+    def __init__(self, definition: FormDefinition):
+        self.definition = definition
+        field_definitions = {}
+        self.filter_adapters: dict[str, TypeAdapter] = {}
+        for field_name, field in definition.fields.items():
+            annotation = FIELD_TYPES[field.type]
+            if field.max_length is not None:
+                annotation = Annotated[annotation, Field(max_length=field.max_length)]
+            self.filter_adapters[field_name] = TypeAdapter(annotation)
+            if field.required:
+                field_definitions[field_name] = (annotation, ...)
+            else:
+                field_definitions[field_name] = (Optional[annotation], None)
+        self.model = create_model(
+            f"{definition.name.title().replace('_', '')}Submission",
+            __config__=ConfigDict(extra="forbid", str_strip_whitespace=True),
+            **field_definitions,
+        )
+
+    @property
+    def name(self) -> str:
+        return self.definition.name
+
+    def validate(self, data: dict) -> dict:
+        """Validate a submission and return its JSON compatible payload without the empty optional fields.
+        Raises pydantic.ValidationError."""
+        return self.model.model_validate(data).model_dump(mode="json", exclude_none=True)
+
+    def parse_filters(self, filters: dict[str, str]) -> dict:
+        """Convert query string filters on known fields to their JSON values, for a payload containment filter.
+        Raises ValueError for unknown fields and invalid values."""
+        parsed = {}
+        for field_name, value in filters.items():
+            adapter = self.filter_adapters.get(field_name)
+            if adapter is None:
+                raise ValueError(f"Unknown field {field_name} for form type {self.name}")
+            try:
+                parsed[field_name] = adapter.dump_python(adapter.validate_strings(value), mode="json")
+            except ValidationError:
+                raise ValueError(f"Invalid value {value!r} for field {field_name}")
+        return parsed
+
+
+_registry: dict[str, CompiledFormDefinition] = {}
+# form types with their own table and routes, a generic definition would split their submissions over two tables
+RESERVED_FORM_TYPES = {"zaansrecht"}
+
+
+def register_form_definition(definition: FormDefinition) -> CompiledFormDefinition:
+    """Register a form type. The compiled definition is cached for the lifetime of the process."""
+    if definition.name in RESERVED_FORM_TYPES:
+        raise ValueError(f"Form type {definition.name} has its own model and can not be registered")
+    if definition.email_field is not None and definition.email_field not in definition.fields:
+        raise ValueError(f"Email field {definition.email_field} is not a field of form {definition.name}")
+    compiled = CompiledFormDefinition(definition)
+    _registry[definition.name] = compiled
+    return compiled
+
+
+def get_form_definition(name: str) -> CompiledFormDefinition | None:
+    return _registry.get(name)
+
+
+def list_form_definitions() -> list[FormDefinition]:
+    return [compiled.definition for compiled in _registry.values()]
+
+
+# Form types. A new client form only needs a definition here, e.g.
+#
+# register_form_definition(FormDefinition(
+#     name="newsletter",
+#     title="Newsletter signup",
+#     email_field="email",
+#     fields={"email": FormField(type="email", required=True), "name": FormField(type="str", max_length=200)},
+# ))
+#
+# The Zaansrecht form keeps its own table (ZaansrechtForm) and the /api/v1/forms/zaansrecht routes.
@@ -4,8 +4,8 @@ It includes schemas for Zaansrecht form submissions, form status updates, and re
 These schemas ensure data validation and serialization for API requests and responses.
 """
 
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, model_validator
+from typing import Any, Optional
 from datetime import datetime
 from enums import FormStatus
 
@@ -19,7 +19,8 @@ class ZaansrechtFormCreate(BaseModel):
     meeting_datetime: Optional[datetime] = None
     meeting_type: Optional[str] = None  # e.g., 'in_person', 'virtual'
 
-class ZaansrechtFormResponse(BaseModel):
+# the form without its free text description, used by the list endpoint
+class ZaansrechtFormSummary(BaseModel):
     id: int
     full_name: str
     email: EmailStr
@@ -28,7 +29,6 @@ class ZaansrechtFormResponse(BaseModel):
     updated_at: Optional[datetime] = None
     terms_accepted: bool
     telephone: Optional[str] = None
-    description: Optional[str] = None
     subject: Optional[str] = None
     meeting_datetime: Optional[datetime] = None
     meeting_type: Optional[str] = None
@@ -36,10 +36,56 @@ class ZaansrechtFormResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ZaansrechtFormResponse(ZaansrechtFormSummary):
+    description: Optional[str] = None
+
+# answer to a repeated submission: no personal data, the duplicate check runs before the captcha
+class DuplicateSubmissionResponse(BaseModel):
+    id: int
+    status: FormStatus
+
+    class Config:
+        from_attributes = True
+
 class FormStatusUpdate(BaseModel):
     new_status: FormStatus
 
 
-class FormListResponse(BaseModel):
+class FormBulkStatusUpdate(BaseModel):
+    new_status: FormStatus
+    form_ids: Optional[list[int]] = None
+    status: Optional[FormStatus] = None  # only update forms currently having this status
+    enforce_transitions: bool = False
+
+    @model_validator(mode="after")
+    def check_filter(self):
+        # never update every form by accident
+        if self.form_ids is None and self.status is None:
+            raise ValueError("Either form_ids or status must be provided")
+        return self
+
+
+class FormBulkStatusUpdateResponse(BaseModel):
+    updated_count: int
     forms: list[ZaansrechtFormResponse]
 
+
+class FormListResponse(BaseModel):
+    forms: list[ZaansrechtFormSummary]
+
+
+class FormSubmissionResponse(BaseModel):
+    id: int
+    form_type: str
+    email: Optional[str] = None
+    status: FormStatus
+    payload: dict[str, Any]
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class FormSubmissionListResponse(BaseModel):
+    submissions: list[FormSubmissionResponse]
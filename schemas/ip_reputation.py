@@ -0,0 +1,49 @@
+"""
+This module provides pydantic schemas for the IP reputation statistics and the blocklist.
+"""
+
+from pydantic import BaseModel, field_validator
+from typing import Optional
+from datetime import datetime
+
+
+class IpStatistics(BaseModel):
+    ip: str
+    submissions: int
+    first_seen: datetime
+    last_seen: datetime
+
+
+class SubnetStatistics(BaseModel):
+    subnet: str
+    submissions: int
+    addresses: int
+    last_seen: datetime
+
+
+class NetworkSubmissionCount(BaseModel):
+    network: str
+    submissions: int
+
+
+class BlockedNetworkCreate(BaseModel):
+    network: str  # CIDR, e.g. 203.0.113.0/24
+    reason: Optional[str] = None
+    expires_at: Optional[datetime] = None
+
+
+class BlockedNetworkResponse(BaseModel):
+    id: int
+    network: str
+    reason: Optional[str] = None
+    created_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+
+    @field_validator("network", mode="before")
+    @classmethod
+    def network_to_str(cls, value):
+        # psycopg2 returns CIDR columns as strings, other drivers as ipaddress objects
+        return str(value)
+
+    class Config:
+        from_attributes = True
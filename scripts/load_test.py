@@ -0,0 +1,50 @@
+"""
+Small closed-loop load test: N concurrent clients send requests to one endpoint for a fixed duration and
+the throughput and latency percentiles are printed.
+
+    uv run python scripts/load_test.py --url http://localhost:8000/health --concurrency 64 --duration 30
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+
+async def _client(client: httpx.AsyncClient, method: str, url: str, deadline: float, latencies: list, errors: list):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(url: str, method: str, concurrency: int, duration: float):
+    latencies: list[float] = []
+    errors: list = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            _client(client, method, url, deadline, latencies, errors) for _ in range(concurrency)
+        ))
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"requests: {len(latencies)}  errors: {len(errors)}")
+    print(f"throughput: {len(latencies) / duration:.1f} req/s")
+    print(f"latency p50: {quantiles[49] * 1000:.1f} ms  p95: {quantiles[94] * 1000:.1f} ms  p99: {quantiles[98] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/health")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=30)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.method, args.concurrency, args.duration))
@@ -0,0 +1,63 @@
+"""
+Production entry point. Runs the API with several uvicorn worker processes, uvloop and httptools.
+
+    uv run python serve.py
+
+Every worker is its own process with its own event loop, connection pool and shared clients (see the lifespan
+in main.py). On SIGTERM uvicorn stops accepting connections and lets in-flight requests finish for up to
+GRACEFUL_TIMEOUT seconds before the workers exit.
+"""
+import os
+import importlib.util
+import logging
+import uvicorn
+from configs.db import POOL_SIZE, MAX_OVERFLOW
+from configs.replicas import DATABASE_REPLICA_URLS
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8000))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+# connections one worker can hold: a full pool for the primary and one for every read replica
+CONNECTIONS_PER_WORKER = (POOL_SIZE + MAX_OVERFLOW) * (1 + len(DATABASE_REPLICA_URLS))
+
+
+def worker_count() -> int:
+    """Number of worker processes: WEB_CONCURRENCY when set, otherwise one per CPU core,
+    capped so all pools together stay below DB_MAX_CONNECTIONS when that is set."""
+    workers = int(os.getenv("WEB_CONCURRENCY", 0)) or os.cpu_count() or 1
+    db_max_connections = int(os.getenv("DB_MAX_CONNECTIONS", 0))
+    if db_max_connections:
+        workers = min(workers, max(1, db_max_connections // CONNECTIONS_PER_WORKER))
+    return workers
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main():
+    workers = worker_count()
+    loop = "uvloop" if _installed("uvloop") else "asyncio"
+    http = "httptools" if _installed("httptools") else "h11"
+    logger.info("Starting %d workers on %s:%d (loop=%s, http=%s)", workers, HOST, PORT, loop, http)
+    uvicorn.run(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        workers=workers,
+        loop=loop,
+        http=http,
+        proxy_headers=True,
+        forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+        timeout_keep_alive=int(os.getenv("KEEP_ALIVE_TIMEOUT", 5)),
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
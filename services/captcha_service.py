@@ -0,0 +1,162 @@
+"""
+This module provides the reCAPTCHA verification and the accept-then-verify worker.
+With CAPTCHA_MODE=deferred a submission is stored right away as PENDING_VERIFICATION and its captcha token is
+handed to the worker, which verifies it against Google in the background. Verified forms move to NEW,
+failed ones to QUARANTINED so they never trigger notifications. The client only waits for the DB write.
+"""
+import asyncio
+import datetime
+import logging
+import os
+import httpx
+from sqlalchemy import update
+from configs.db import SessionLocal
+from configs.http_client import get_http_client
+from models.form import ZaansrechtForm, FormSubmission
+from enums import FormStatus
+from services.circuit_breaker import CircuitBreaker
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RECAPTCHA_SECRET_KEY = os.getenv("RECAPTCHA_SECRET_KEY", "your_secret_key_here")
+RECAPTCHA_VERIFY_URL = "https://www.google.com/recaptcha/api/siteverify"
+
+RECAPTCHA_TIMEOUT = float(os.getenv("RECAPTCHA_TIMEOUT_SECONDS", 3))
+CAPTCHA_MODE = os.getenv("CAPTCHA_MODE", "sync")  # sync | deferred
+# what to do when Google can not be reached: fail_closed rejects the submission with a 503,
+# accept_and_flag stores it as PENDING_VERIFICATION so it is verified later or reviewed by staff
+CAPTCHA_FALLBACK = os.getenv("CAPTCHA_FALLBACK", "fail_closed")  # fail_closed | accept_and_flag
+CAPTCHA_VERIFY_CONCURRENCY = int(os.getenv("CAPTCHA_VERIFY_CONCURRENCY", 4))
+CAPTCHA_VERIFY_QUEUE_SIZE = int(os.getenv("CAPTCHA_VERIFY_QUEUE_SIZE", 1000))
+# reCAPTCHA tokens expire after two minutes, forms still pending after this were lost (e.g. a worker restart)
+CAPTCHA_PENDING_TIMEOUT = datetime.timedelta(minutes=int(os.getenv("CAPTCHA_PENDING_TIMEOUT_MINUTES", 10)))
+CAPTCHA_SWEEP_INTERVAL = 60
+
+
+recaptcha_breaker = CircuitBreaker(
+    "recaptcha",
+    call_timeout=RECAPTCHA_TIMEOUT,
+    failure_threshold=int(os.getenv("RECAPTCHA_BREAKER_FAILURES", 5)),
+    reset_timeout=float(os.getenv("RECAPTCHA_BREAKER_RESET_SECONDS", 30)),
+    failure_exceptions=(httpx.HTTPError, ValueError),
+)
+
+
+async def _post_siteverify(captcha_token: str) -> dict:
+    response = await get_http_client().post(
+        RECAPTCHA_VERIFY_URL,
+        data={"secret": RECAPTCHA_SECRET_KEY, "response": captcha_token},
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def siteverify(captcha_token: str) -> dict:
+    """Verify a reCAPTCHA token with Google and return its response.
+    Raises UpstreamUnavailableException when Google fails, is too slow or its circuit is open."""
+    return await recaptcha_breaker.call(_post_siteverify, captcha_token)
+
+
+class CaptchaVerificationWorker:
+    def __init__(self, concurrency: int = CAPTCHA_VERIFY_CONCURRENCY, queue_size: int = CAPTCHA_VERIFY_QUEUE_SIZE):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def deferred_enabled(self) -> bool:
+        """Deferred verification needs the worker, without it (e.g. serverless) captchas are verified inline."""
+        return CAPTCHA_MODE == "deferred" and self.running and not self._queue.full()
+
+    def start(self):
+        if CAPTCHA_MODE != "deferred":
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+        logger.info("Captcha verification worker started with %d consumers", self.concurrency)
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def submit(self, form_id: int, captcha_token: str, model=ZaansrechtForm):
+        """Queue the captcha of a stored PENDING_VERIFICATION form (a ZaansrechtForm or a FormSubmission)."""
+        if not self.running:
+            logger.warning("Captcha verification worker is not running, form ID %d stays pending for review", form_id)
+            return
+        try:
+            self._queue.put_nowait((model, form_id, captcha_token))
+        except asyncio.QueueFull:
+            # the form stays pending and is quarantined by the sweep, it never counts as verified
+            logger.error("Captcha verification queue is full, form ID %d stays pending", form_id)
+
+    async def _consume(self):
+        while True:
+            model, form_id, captcha_token = await self._queue.get()
+            try:
+                result = await siteverify(captcha_token)
+                verified = bool(result.get("success"))
+                logger.info("Deferred captcha verification for form ID %d: %s", form_id, result)
+            except Exception as e:
+                # Google could not tell; leave the form pending, the sweep quarantines it if it stays that way
+                logger.error("Deferred captcha verification for form ID %d failed: %s", form_id, e)
+                continue
+            try:
+                await asyncio.to_thread(
+                    self._set_status, model, form_id, FormStatus.NEW if verified else FormStatus.QUARANTINED
+                )
+            except Exception as e:
+                logger.error("Could not store the captcha result of form ID %d: %s", form_id, e)
+
+    @staticmethod
+    def _set_status(model, form_id: int, status: FormStatus):
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(model)
+                .where(model.id == form_id, model.status == FormStatus.PENDING_VERIFICATION)
+                .values(status=status)
+            )
+            db.commit()
+            logger.info("Form ID %d moved to %s after captcha verification", form_id, status)
+        finally:
+            db.close()
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(CAPTCHA_SWEEP_INTERVAL)
+            try:
+                await asyncio.to_thread(self._quarantine_expired)
+            except Exception as e:
+                logger.error("Quarantining expired pending forms failed: %s", e)
+
+    @staticmethod
+    def _quarantine_expired():
+        """Quarantine forms that stayed pending longer than a captcha token can live."""
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - CAPTCHA_PENDING_TIMEOUT
+        db = SessionLocal()
+        try:
+            for model in (ZaansrechtForm, FormSubmission):
+                result = db.execute(
+                    update(model)
+                    .where(model.status == FormStatus.PENDING_VERIFICATION, model.created_at < cutoff)
+                    .values(status=FormStatus.QUARANTINED)
+                )
+                db.commit()
+                if result.rowcount:
+                    logger.warning("Quarantined %d %s rows that were never verified", result.rowcount, model.__tablename__)
+        finally:
+            db.close()
+
+
+captcha_verifier = CaptchaVerificationWorker()
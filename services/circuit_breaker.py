@@ -0,0 +1,95 @@
+"""
+This module provides a circuit breaker for calls to upstream services like reCAPTCHA and the SMTP relay.
+Every call gets a latency budget. After `failure_threshold` consecutive failures the breaker opens and calls fail
+immediately with CircuitOpenException; after `reset_timeout` one probe call is let through (half-open) and its
+result closes or re-opens the breaker. A degraded upstream then costs milliseconds instead of blocked workers.
+"""
+import asyncio
+import logging
+import time
+import exceptions as exceptions
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# name -> breaker, for the health output
+circuit_breakers: dict[str, "CircuitBreaker"] = {}
+
+
+class CircuitBreaker:
+    def __init__(
+            self,
+            name: str,
+            call_timeout: float,
+            failure_threshold: int = 5,
+            reset_timeout: float = 30,
+            failure_exceptions: tuple[type[BaseException], ...] = (Exception,)
+        ):
+        self.name = name
+        self.call_timeout = call_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failure_exceptions = failure_exceptions
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        circuit_breakers[name] = self
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+    async def call(self, func, *args, **kwargs):
+        """Await `func(*args, **kwargs)` within the latency budget. Failures and timeouts raise
+        UpstreamUnavailableException, an open breaker raises CircuitOpenException without calling."""
+        self._before_call()
+        try:
+            result = await asyncio.wait_for(func(*args, **kwargs), self.call_timeout)
+        except asyncio.TimeoutError as e:
+            self._on_failure(f"timed out after {self.call_timeout}s")
+            raise exceptions.UpstreamUnavailableException(f"{self.name} timed out after {self.call_timeout}s") from e
+        except self.failure_exceptions as e:
+            self._on_failure(str(e))
+            raise exceptions.UpstreamUnavailableException(f"{self.name} failed: {e}") from e
+        except BaseException:
+            # not an upstream failure (e.g. cancellation), do not keep the half-open probe slot
+            self._probing = False
+            raise
+        self._on_success()
+        return result
+
+    def _before_call(self):
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise exceptions.CircuitOpenException(f"{self.name} circuit is open")
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            # only one probe at a time, the rest keep failing fast until it has a result
+            if self._probing:
+                raise exceptions.CircuitOpenException(f"{self.name} circuit is half-open")
+            self._probing = True
+
+    def _on_success(self):
+        self.failures = 0
+        self._probing = False
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def _on_failure(self, reason: str):
+        self.failures += 1
+        self._probing = False
+        logger.warning("Circuit %s: call failed (%d in a row): %s", self.name, self.failures, reason)
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+    def _set_state(self, state: str):
+        if state == OPEN:
+            logger.error("Circuit %s opened after %d failures, failing fast for %.1fs",
+                         self.name, self.failures, self.reset_timeout)
+        else:
+            logger.info("Circuit %s: %s -> %s", self.name, self.state, state)
+        self.state = state
@@ -1,7 +1,9 @@
 # app/services/email_service.py
+import asyncio
 import logging
 import aiosmtplib
 from email.message import EmailMessage
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from models.email_log import EmailLog
 import datetime
@@ -9,6 +11,8 @@ from enums import EmailStatus
 from dotenv import load_dotenv
 import os
 import exceptions as exceptions
+from services.email_log_writer import email_log_writer
+from services.circuit_breaker import CircuitBreaker
 
 load_dotenv()
 
@@ -16,6 +20,31 @@ logger = logging.getLogger(__name__)
 
 THROTTLE_LIMIT = 3  # max emails per minute
 THROTTLE_WINDOW = datetime.timedelta(minutes=1)
+# Only look this far back for queued emails so the lookup is pruned to the most recent partitions.
+# The retention cron marks emails still queued after this as FAILED.
+QUEUED_LOOKBACK = datetime.timedelta(days=int(os.getenv("QUEUED_EMAIL_LOOKBACK_DAYS", 30)))
+
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT_SECONDS", 10))
+smtp_breaker = CircuitBreaker(
+    "smtp",
+    call_timeout=SMTP_TIMEOUT,
+    failure_threshold=int(os.getenv("SMTP_BREAKER_FAILURES", 3)),
+    reset_timeout=float(os.getenv("SMTP_BREAKER_RESET_SECONDS", 60)),
+    # connection level errors (refused, dropped, timed out) all derive from OSError; a refused recipient does not
+    failure_exceptions=(OSError,),
+)
+
+# list endpoints leave out the body, it is only loaded by the detail endpoint
+EMAIL_SUMMARY_COLUMNS = (
+    EmailLog.id,
+    EmailLog.sender,
+    EmailLog.receiver,
+    EmailLog.subject,
+    EmailLog.status,
+    EmailLog.error_message,
+    EmailLog.created_at,
+    EmailLog.updated_at,
+)
 
 class EmailService:
     def __init__(self, db: Session):
@@ -59,17 +88,25 @@ class EmailService:
             email_log.status = EmailStatus.SENDING
             # log initial entry
 
-            # send email
-            await aiosmtplib.send(
+            # send email, within the latency budget of the SMTP circuit breaker
+            await smtp_breaker.call(
+                aiosmtplib.send,
                 message,
                 hostname=self.smtp_host,
                 port=self.smtp_port,
                 username=self.smtp_user,
                 password=self.smtp_pass,
-                start_tls=True
+                start_tls=True,
+                timeout=SMTP_TIMEOUT,
             )
             email_log.status = EmailStatus.SENT
             logger.info("Email ID: %d sent successfully", email_log.id)
+        except exceptions.UpstreamUnavailableException as e:
+            # the relay is down or slow, not the message: leave it queued for the next drain
+            email_log.status = EmailStatus.QUEUED
+            email_log.error_message = str(e)  # type: ignore
+            logger.warning("SMTP unavailable, email ID %d stays queued: %s", email_log.id, e)
+            raise
         except Exception as e:
             email_log.status = EmailStatus.FAILED
             email_log.error_message = str(e)  # type: ignore
@@ -82,23 +119,32 @@ class EmailService:
             logger.debug("Finalized email ID: %s", email_log.id)
 
     def get_sent_emails_by_status(self, status: EmailStatus):
-        """Retrieve all sent emails by status."""
-        sent_emails = self.db.query(EmailLog).filter(EmailLog.status == status).all()
+        """Retrieve the summaries of all emails with a status, as plain rows without the body."""
+        sent_emails = self.db.execute(
+            select(*EMAIL_SUMMARY_COLUMNS).where(EmailLog.status == status)
+        ).mappings().all()
         logger.info("Retrieved %d sent emails with status %s", len(sent_emails), status)
         return sent_emails
     
     def get_all_emails(self):
-        """Retrieve all emails."""
-        all_emails = self.db.query(EmailLog).all()
+        """Retrieve the summaries of all emails, as plain rows without the body."""
+        all_emails = self.db.execute(select(*EMAIL_SUMMARY_COLUMNS)).mappings().all()
         logger.info("Retrieved %d total emails", len(all_emails))
         return all_emails
 
+    def get_email(self, email_id: int):
+        """Retrieve a single email including its body."""
+        email = self.db.query(EmailLog).filter(EmailLog.id == email_id).first()
+        if email is None:
+            logger.warning("Email with id %d not found", email_id)
+        return email
+
     def get_email_status(self, email_id: int):
         """Retrieve the status of a specific email."""
-        email = self.db.query(EmailLog).filter(EmailLog.id == email_id).first()
-        if email:
-            logger.info("Retrieved status for email_id %d: %s", email_id, email.status)
-            return email.status
+        status = self.db.execute(select(EmailLog.status).where(EmailLog.id == email_id)).scalar()
+        if status:
+            logger.info("Retrieved status for email_id %d: %s", email_id, status)
+            return status
         logger.warning("Email with id %d not found", email_id)
         return None
 
@@ -116,3 +162,12 @@ class EmailService:
         self.db.commit()
         logger.info("Stored email log entry: %s with message: %s", log_entry, message)
         return log_entry
+
+    async def enqueue_email_log(self, sender: str, subject: str, message: str):
+        """Hand a queued email log to the group-commit writer, which inserts it together with other queued emails."""
+        if not email_log_writer.running:
+            # no lifespan (e.g. serverless), write it directly
+            await asyncio.to_thread(self.queue_new_email_log, sender, subject, message)
+            return
+        await email_log_writer.enqueue(sender=sender, receiver=self.to_email, subject=subject, message=message)
+        logger.info("Buffered email log entry for %s", sender)
@@ -0,0 +1,176 @@
+"""
+This module provides the group-commit writer for queued email logs.
+Instead of one INSERT + COMMIT per queued email, rows are collected in a bounded in-process buffer and flushed
+in multi-row inserts every few milliseconds or every N rows, using a session owned by the writer.
+The bounded buffer applies backpressure to the callers, and on shutdown the buffer is flushed within a deadline.
+When the flush loop dies the writer stops accepting rows, callers fall back to direct inserts, what was buffered is
+flushed directly and the failure shows up in the readiness snapshot.
+"""
+import asyncio
+import logging
+import os
+from sqlalchemy import insert
+from configs.db import SessionLocal
+from models.email_log import EmailLog
+from enums import EmailStatus
+import exceptions as exceptions
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EMAIL_LOG_BUFFER_SIZE = int(os.getenv("EMAIL_LOG_BUFFER_SIZE", 1000))
+EMAIL_LOG_BATCH_SIZE = int(os.getenv("EMAIL_LOG_BATCH_SIZE", 100))
+EMAIL_LOG_FLUSH_INTERVAL = float(os.getenv("EMAIL_LOG_FLUSH_INTERVAL_MS", 20)) / 1000
+EMAIL_LOG_ENQUEUE_TIMEOUT = float(os.getenv("EMAIL_LOG_ENQUEUE_TIMEOUT_SECONDS", 2))
+EMAIL_LOG_SHUTDOWN_TIMEOUT = float(os.getenv("EMAIL_LOG_SHUTDOWN_TIMEOUT_SECONDS", 10))
+
+
+class EmailLogWriter:
+    def __init__(
+            self,
+            buffer_size: int = EMAIL_LOG_BUFFER_SIZE,
+            batch_size: int = EMAIL_LOG_BATCH_SIZE,
+            flush_interval: float = EMAIL_LOG_FLUSH_INTERVAL
+        ):
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._rescue: asyncio.Task | None = None
+        self.failure: str | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "buffered": self._queue.qsize() if self._queue is not None else 0,
+            "failure": self.failure,
+        }
+
+    def start(self):
+        """Start the flush loop on the running event loop."""
+        self._queue = asyncio.Queue(maxsize=self.buffer_size)
+        self.failure = None
+        self._task = asyncio.create_task(self._run())
+        self._task.add_done_callback(self._on_done)
+        logger.info("Email log writer started (batch size %d, flush interval %.3fs)", self.batch_size, self.flush_interval)
+
+    def _on_done(self, task: asyncio.Task):
+        if task.cancelled() or task.exception() is None:
+            return
+        # running turns False, so new rows are inserted directly by the callers
+        if self._task is task:
+            self._task = None
+        self.failure = repr(task.exception())
+        logger.error("Email log writer stopped unexpectedly: %s", self.failure)
+        rows = self._take_buffered()
+        if rows:
+            self._rescue = asyncio.create_task(asyncio.to_thread(self._flush_rows, rows))
+
+    async def stop(self, timeout: float = EMAIL_LOG_SHUTDOWN_TIMEOUT):
+        """Flush what is buffered and stop, giving up after `timeout` seconds."""
+        if self._rescue is not None:
+            await self._rescue
+            self._rescue = None
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+
+        async def drain():
+            await self._queue.put(None)
+            await task
+
+        try:
+            await asyncio.wait_for(drain(), timeout)
+        except asyncio.TimeoutError:
+            task.cancel()
+            logger.error("Email log writer did not flush within %.1fs, %d rows lost", timeout, self._queue.qsize())
+        logger.info("Email log writer stopped")
+
+    async def enqueue(self, sender: str, receiver: str, subject: str, message: str,
+                      timeout: float = EMAIL_LOG_ENQUEUE_TIMEOUT):
+        """Buffer a queued email log row. Waits while the buffer is full and raises when it stays full."""
+        if self._task is None:
+            raise exceptions.EmailQueueFullException("Email log writer is not running")
+        row = {
+            "sender": sender,
+            "receiver": receiver,
+            "subject": subject,
+            "body": message,
+            "status": EmailStatus.QUEUED,
+            "error_message": None,
+        }
+        try:
+            await asyncio.wait_for(self._queue.put(row), timeout)
+        except asyncio.TimeoutError:
+            raise exceptions.EmailQueueFullException("Email log buffer is full")
+        if self._task is None:
+            # the flush loop died while this row waited for room in the buffer
+            await asyncio.to_thread(self._flush_rows, self._take_buffered())
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is None:
+                break
+            batch = [row]
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+            await asyncio.to_thread(self._flush, batch)
+
+        # drain what was buffered behind the stop marker
+        await asyncio.to_thread(self._flush_rows, self._take_buffered())
+
+    def _take_buffered(self) -> list[dict]:
+        rows = []
+        while not self._queue.empty():
+            row = self._queue.get_nowait()
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    def _flush_rows(self, rows: list[dict]):
+        for start in range(0, len(rows), self.batch_size):
+            self._flush(rows[start:start + self.batch_size])
+
+    def _flush(self, batch: list[dict]):
+        """Insert a batch in one multi-row INSERT and a single commit."""
+        db = SessionLocal()
+        try:
+            db.execute(insert(EmailLog), batch)
+            db.commit()
+            logger.debug("Flushed %d email log rows", len(batch))
+        except Exception as e:
+            db.rollback()
+            logger.error("Failed to flush %d email log rows, retrying one by one: %s", len(batch), e)
+            # one bad row must not take the rest of the batch with it
+            for row in batch:
+                try:
+                    db.execute(insert(EmailLog), [row])
+                    db.commit()
+                except Exception as row_error:
+                    db.rollback()
+                    logger.error("Dropped email log row for %s: %s", row["sender"], row_error)
+        finally:
+            db.close()
+
+
+email_log_writer = EmailLogWriter()
@@ -4,14 +4,41 @@ It includes functionalities for different types of forms, such as ZaansrechtForm
 Also it provides methods to query and manipulate form data stored in the database.
 Besides basic CRUD operations, it uses the email service to send notifications based on form submissions.
 """
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
-from models.form import ZaansrechtForm, FormSubmissionLog
+from models.form import ZaansrechtForm, FormSubmission, FormSubmissionLog
+from schemas.form_definitions import CompiledFormDefinition
 from enums import FormStatus
 from services.emai_service import EmailService
+from services.idempotency_service import IdempotencyService
+from services.ip_reputation_service import parse_ip
+import exceptions as exceptions
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Status -> statuses a form is allowed to move to when transitions are enforced.
+ALLOWED_STATUS_TRANSITIONS: dict[FormStatus, set[FormStatus]] = {
+    FormStatus.NEW: {FormStatus.VIEWED, FormStatus.IN_PROGRESS, FormStatus.ARCHIVED},
+    FormStatus.VIEWED: {FormStatus.IN_PROGRESS, FormStatus.ARCHIVED},
+    FormStatus.IN_PROGRESS: {FormStatus.ARCHIVED},
+    FormStatus.ARCHIVED: {FormStatus.IN_PROGRESS},
+    FormStatus.QUARANTINED: {FormStatus.NEW, FormStatus.ARCHIVED},
+    # manual review of submissions accepted while the captcha could not be verified
+    FormStatus.PENDING_VERIFICATION: {FormStatus.NEW, FormStatus.QUARANTINED},
+}
+# Statuses of submissions that did not pass the captcha (yet), hidden from the default listing.
+UNVERIFIED_STATUSES = (FormStatus.PENDING_VERIFICATION, FormStatus.QUARANTINED)
+# The list endpoint leaves out the free text description, it is only loaded for a single form.
+FORM_SUMMARY_COLUMNS = tuple(
+    column for key, column in ZaansrechtForm.__mapper__.columns.items() if key != "description"
+)
+
+
+def allowed_source_statuses(new_status: FormStatus) -> list[FormStatus]:
+    """Return the statuses a form may currently have to be moved to `new_status`."""
+    return [status for status, targets in ALLOWED_STATUS_TRANSITIONS.items() if new_status in targets]
+
 
 class FormService:
     def __init__(self, db: Session):
@@ -26,9 +53,12 @@ class FormService:
             description: str|None = None,
             subject: str|None = None,
             meeting_datetime: str|None = None,
-            meeting_type: str|None = None
+            meeting_type: str|None = None,
+            idempotency_keys: dict|None = None,
+            status: FormStatus = FormStatus.NEW
         ) -> ZaansrechtForm:
-        """Create and save a new Zaansrecht form submission."""
+        """Create and save a new Zaansrecht form submission.
+        When idempotency keys are given they are stored in the same transaction as the form."""
         # before creating the instance of the form, convert the captcha token but only the first 5 and last five characters.
         # altered_captcha_token = f"{captcha_token[:5]}...{captcha_token[-5:]}"
 
@@ -41,37 +71,149 @@ class FormService:
             subject=subject,
             meeting_datetime=meeting_datetime,
             meeting_type=meeting_type,
-            status=FormStatus.NEW,
+            status=status,
         )
         self.db.add(form)
+        if idempotency_keys:
+            self.db.flush()
+            idempotency_service = IdempotencyService(self.db)
+            if not idempotency_service.claim_keys(form.id, idempotency_keys):
+                # a concurrent identical submission committed first, hand back that form instead
+                self.db.rollback()
+                original_form = idempotency_service.find_original_form(idempotency_keys)
+                if original_form is not None:
+                    raise exceptions.DuplicateSubmissionException(original_form)
+                raise exceptions.DatabaseException("Could not claim the idempotency keys of the submission")
         self.db.commit()
         self.db.refresh(form)
         logger.info("Created Zaansrecht form with ID %d", form.id)
         return form
 
     def get_forms_by_status_or_all(self, status: FormStatus|None = None):
-        """Retrieve all forms with a specific status or all forms if status is None."""
+        """Retrieve the summaries of all forms with a specific status or all verified forms if status is None.
+        Returns plain rows without the description, get_form loads a complete form."""
         logger.info("Retrieving forms with status: %s", status)
+        statement = select(*FORM_SUMMARY_COLUMNS)
         if status is None:
-            forms = self.db.query(ZaansrechtForm).all()
+            statement = statement.where(ZaansrechtForm.status.not_in(UNVERIFIED_STATUSES))
         else:
-            forms = self.db.query(ZaansrechtForm).filter(ZaansrechtForm.status == status).all()
+            statement = statement.where(ZaansrechtForm.status == status)
+        forms = self.db.execute(statement).mappings().all()
         logger.info("Retrieved %d forms with status %s", len(forms), status)
         return forms
 
-    def update_form_status(self, form_id: int, new_status: FormStatus):
-        """Update the status of a specific form."""
-        form = self.db.query(ZaansrechtForm).filter(ZaansrechtForm.id == form_id).first()
+    def get_form(self, form_id: int):
+        """Retrieve a single form including its description."""
+        return self.db.query(ZaansrechtForm).filter(ZaansrechtForm.id == form_id).first()
+
+    def _status_update_statement(self, new_status: FormStatus, enforce_transitions: bool = False, model=ZaansrechtForm):
+        """Build an UPDATE ... RETURNING statement that returns the updated rows as plain column values, keyed by
+        attribute name (a column may be named differently, e.g. description_compressed)."""
+        statement = (
+            update(model)
+            .values(status=new_status)
+            .returning(*(attribute.columns[0].label(attribute.key) for attribute in model.__mapper__.column_attrs))
+            .execution_options(synchronize_session=False)
+        )
+        if enforce_transitions:
+            statement = statement.where(model.status.in_(allowed_source_statuses(new_status)))
+        return statement
+
+    def update_form_status(self, form_id: int, new_status: FormStatus, enforce_transitions: bool = False):
+        """Update the status of a specific form in a single statement and return the updated row."""
+        statement = self._status_update_statement(new_status, enforce_transitions).where(ZaansrechtForm.id == form_id)
+        form = self.db.execute(statement).mappings().first()
+        self.db.commit()
         if form:
-            form.status = new_status
-            self.db.commit()
             logger.info("Updated form ID %d to status %s", form_id, new_status)
-            return form
+            return dict(form)
+        if enforce_transitions:
+            # only on the failure path: tell a missing form apart from a refused transition
+            current_status = self.db.query(ZaansrechtForm.status).filter(ZaansrechtForm.id == form_id).scalar()
+            if current_status is not None:
+                logger.warning("Form ID %d can not move from %s to %s", form_id, current_status, new_status)
+                raise exceptions.InvalidStatusTransitionException(
+                    f"Form {form_id} can not move from {current_status} to {new_status}"
+                )
         logger.warning("Form with ID %d not found for status update", form_id)
         return None
-    
+
+    def bulk_update_form_status(
+            self,
+            new_status: FormStatus,
+            form_ids: list[int]|None = None,
+            status: FormStatus|None = None,
+            enforce_transitions: bool = False
+        ) -> list[dict]:
+        """Update the status of all forms matching the given ids and/or current status in a single statement.
+        Forms that do not allow the transition are skipped when transitions are enforced."""
+        statement = self._status_update_statement(new_status, enforce_transitions)
+        if form_ids is not None:
+            statement = statement.where(ZaansrechtForm.id.in_(form_ids))
+        if status is not None:
+            statement = statement.where(ZaansrechtForm.status == status)
+        forms = [dict(form) for form in self.db.execute(statement).mappings().all()]
+        self.db.commit()
+        logger.info("Bulk updated %d forms to status %s", len(forms), new_status)
+        return forms
+
+    def create_submission(
+            self,
+            form_definition: CompiledFormDefinition,
+            payload: dict,
+            status: FormStatus = FormStatus.NEW
+        ) -> FormSubmission:
+        """Save a submission of any registered form type. The payload must be validated by the definition."""
+        email_field = form_definition.definition.email_field
+        submission = FormSubmission(
+            form_type=form_definition.name,
+            email=payload.get(email_field) if email_field else None,
+            status=status,
+            payload=payload,
+        )
+        self.db.add(submission)
+        self.db.commit()
+        self.db.refresh(submission)
+        logger.info("Created %s submission with ID %d", form_definition.name, submission.id)
+        return submission
+
+    def get_submissions(self, form_type: str, status: FormStatus|None = None, payload_filter: dict|None = None):
+        """Retrieve the submissions of a form type, optionally by status and by payload values (JSONB containment)."""
+        query = self.db.query(FormSubmission).filter(FormSubmission.form_type == form_type)
+        if status is None:
+            query = query.filter(FormSubmission.status.not_in(UNVERIFIED_STATUSES))
+        else:
+            query = query.filter(FormSubmission.status == status)
+        if payload_filter:
+            query = query.filter(FormSubmission.payload.contains(payload_filter))
+        submissions = query.all()
+        logger.info("Retrieved %d %s submissions with status %s", len(submissions), form_type, status)
+        return submissions
+
+    def update_submission_status(self, submission_id: int, new_status: FormStatus, enforce_transitions: bool = False):
+        """Update the status of a submission of any form type in a single statement and return the updated row."""
+        statement = self._status_update_statement(new_status, enforce_transitions, model=FormSubmission).where(
+            FormSubmission.id == submission_id
+        )
+        submission = self.db.execute(statement).mappings().first()
+        self.db.commit()
+        if submission:
+            logger.info("Updated submission ID %d to status %s", submission_id, new_status)
+            return dict(submission)
+        if enforce_transitions:
+            current_status = self.db.query(FormSubmission.status).filter(FormSubmission.id == submission_id).scalar()
+            if current_status is not None:
+                raise exceptions.InvalidStatusTransitionException(
+                    f"Submission {submission_id} can not move from {current_status} to {new_status}"
+                )
+        logger.warning("Submission with ID %d not found for status update", submission_id)
+        return None
+
     def send_form_notification(self, form: ZaansrechtForm):
         """Send a notification email upon form submission."""
+        if form.status in UNVERIFIED_STATUSES:
+            logger.warning("Skipping notification for unverified form ID %d with status %s", form.id, form.status)
+            return
         email_service = EmailService(self.db)
         subject = f"New Zaansrecht Form Submission from {form.subject}"
         default_body = f"A new Zaansrecht form has been submitted.\n\nDetails:\nName: {form.full_name}\nEmail: {form.email}\n"
@@ -86,10 +228,12 @@ class FormService:
 
 
 class FormSubmissionLogService:
-    """Service to handle logging of form submissions. It is tightly coupled with form submissions to track metadata."""
-    def __init__(self, db: Session, form_id: int, **kwargs):
+    """Service to handle logging of form submissions. It is tightly coupled with form submissions to track metadata.
+    Pass `form_id` for a ZaansrechtForm or `submission_id` for a generic FormSubmission."""
+    def __init__(self, db: Session, form_id: int|None = None, submission_id: int|None = None, **kwargs):
         self.db = db
         self.form_id = form_id
+        self.submission_id = submission_id
         self.kwargs = kwargs
 
     def log_form_submission(self) -> FormSubmissionLog|None:
@@ -101,20 +245,23 @@ class FormSubmissionLogService:
 
         log_entry = FormSubmissionLog(
             form_id=self.form_id,
+            submission_id=self.submission_id,
             user_agent=self.kwargs.get("user_agent"),
             referrer=self.kwargs.get("referrer"),
             x_forwarded_for=x_forwarded_for,
-            x_real_ip=self.kwargs.get("x_real_ip"),
+            x_real_ip=self._client_ip(self.kwargs.get("x_real_ip")),
             captcha_token=captcha_token
         )
         try:
             self.db.add(log_entry)
             self.db.commit()
             self.db.refresh(log_entry)
-            logger.info("Logged submission for form ID %d with log ID %d", self.form_id, log_entry.id)
+            logger.info("Logged submission for form ID %s / submission ID %s with log ID %d",
+                        self.form_id, self.submission_id, log_entry.id)
             return log_entry
         except Exception as e:
-            logger.error("Failed to log submission for form ID %d: %s", self.form_id, e)
+            logger.error("Failed to log submission for form ID %s / submission ID %s: %s",
+                         self.form_id, self.submission_id, e)
             self.db.rollback()
             return None
 
@@ -126,6 +273,11 @@ class FormSubmissionLogService:
             return ip_list
         return []
     
+    def _client_ip(self, client_ip: str|None) -> str|None:
+        """The client IP as stored in the INET column, None when it is not an address (e.g. "unknown")."""
+        address = parse_ip(client_ip)
+        return str(address) if address is not None else None
+
     def _shorten_captcha_token(self, captcha_token: str|None) -> str|None:
         """Shorten the captcha token for logging purposes."""
         if captcha_token and len(captcha_token) > 10:
@@ -0,0 +1,198 @@
+"""
+This module provides the readiness probes of the service.
+A background task probes the database, the connection pool and the email queue every few seconds and keeps the
+result in memory, so the readiness endpoint is served from that cache and orchestrator probes never hit Postgres.
+"""
+import asyncio
+import datetime
+import logging
+import os
+import time
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import text
+from configs.db import SessionLocal, engine, POOL_SIZE, MAX_OVERFLOW
+from models.email_log import EmailLog
+from models.job_heartbeat import JobHeartbeat
+from enums import EmailStatus
+from services.emai_service import QUEUED_LOOKBACK
+from services.email_log_writer import email_log_writer
+from middlewares.load_shedding import admission_controller
+from services.circuit_breaker import circuit_breakers
+from configs.replicas import replica_router
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+READINESS_PROBE_INTERVAL = float(os.getenv("READINESS_PROBE_INTERVAL_SECONDS", 5))
+# a snapshot older than this means the probe loop itself is stuck
+READINESS_MAX_SNAPSHOT_AGE = float(os.getenv("READINESS_MAX_SNAPSHOT_AGE_SECONDS", READINESS_PROBE_INTERVAL * 3))
+READINESS_MAX_QUEUE_LAG = float(os.getenv("READINESS_MAX_QUEUE_LAG_SECONDS", 3600))
+
+EMAIL_DRAIN_JOB = "send_queued_emails"
+
+
+def record_job_success(db: Session, name: str):
+    """Store the moment a background job last completed successfully."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    statement = insert(JobHeartbeat).values(name=name, last_success_at=now)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[JobHeartbeat.name],
+        set_={"last_success_at": statement.excluded.last_success_at},
+    ))
+    db.commit()
+
+
+def record_job_failure(db: Session, name: str, error: str):
+    """Store the moment and the reason a background job last failed, e.g. when its upstream is down."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    statement = insert(JobHeartbeat).values(name=name, last_failure_at=now, last_error=error)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[JobHeartbeat.name],
+        set_={"last_failure_at": statement.excluded.last_failure_at, "last_error": statement.excluded.last_error},
+    ))
+    db.commit()
+
+
+def pool_status() -> dict:
+    """Utilization of this process's connection pool."""
+    checked_out = engine.pool.checkedout()
+    capacity = POOL_SIZE + MAX_OVERFLOW
+    return {
+        "size": engine.pool.size(),
+        "checked_out": checked_out,
+        "overflow": max(engine.pool.overflow(), 0),
+        "capacity": capacity,
+        "utilization": round(checked_out / capacity, 2),
+    }
+
+
+class ReadinessMonitor:
+    def __init__(self, interval: float = READINESS_PROBE_INTERVAL, max_age: float = READINESS_MAX_SNAPSHOT_AGE):
+        self.interval = interval
+        self.max_age = max_age
+        self._snapshot: dict | None = None
+        self._probed_at = 0.0
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error("Readiness probe failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def refresh(self):
+        snapshot = await asyncio.to_thread(self._probe)
+        self._snapshot, self._probed_at = snapshot, time.monotonic()
+
+    async def snapshot(self) -> dict:
+        """Return the cached probe result. Without a running probe loop (e.g. serverless) it is refreshed
+        at most once per interval, no matter how many probes come in."""
+        if self._task is None and time.monotonic() - self._probed_at >= self.interval:
+            async with self._lock:
+                if time.monotonic() - self._probed_at >= self.interval:
+                    await self.refresh()
+        if self._snapshot is None:
+            return {"status": "unavailable", "reason": "no probe result yet"}
+
+        age = time.monotonic() - self._probed_at
+        snapshot = {**self._snapshot, "probe_age_seconds": round(age, 1)}
+        if age > self.max_age:
+            snapshot["status"] = "unavailable"
+            snapshot["reason"] = "probe result is stale"
+        return snapshot
+
+    def _probe(self) -> dict:
+        snapshot = {
+            "status": "ok",
+            "database": {},
+            "pool": pool_status(),
+            "admission": admission_controller.stats(),
+            "circuit_breakers": {name: breaker.stats() for name, breaker in circuit_breakers.items()},
+            "replicas": replica_router.stats(),
+            "email_log_writer": email_log_writer.stats(),
+            "email_queue": {},
+        }
+        if snapshot["pool"]["checked_out"] >= snapshot["pool"]["capacity"]:
+            # do not wait pool_timeout for a connection, the pool is the problem
+            snapshot["status"] = "unavailable"
+            snapshot["reason"] = "connection pool exhausted"
+            snapshot["database"]["reachable"] = None
+            return snapshot
+
+        start = time.perf_counter()
+        db = SessionLocal()
+        try:
+            db.execute(text("SELECT 1"))
+            snapshot["database"] = {"reachable": True, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+            snapshot["email_queue"] = self._probe_email_queue(db)
+        except Exception as e:
+            logger.error("Readiness database probe failed: %s", e)
+            snapshot["status"] = "unavailable"
+            snapshot["reason"] = "database unreachable"
+            snapshot["database"] = {"reachable": False}
+            return snapshot
+        finally:
+            db.close()
+
+        if email_log_writer.failure is not None:
+            snapshot["status"] = "degraded"
+            snapshot["reason"] = "email log writer stopped, queued emails are inserted one by one"
+        if snapshot["email_queue"]["last_drain_failed"]:
+            snapshot["status"] = "degraded"
+            snapshot["reason"] = f"email drain failed: {snapshot['email_queue']['last_drain_error']}"
+        lag = snapshot["email_queue"]["oldest_queued_age_seconds"]
+        if lag is not None and lag > READINESS_MAX_QUEUE_LAG:
+            snapshot["status"] = "degraded"
+            snapshot["reason"] = "email queue is not draining"
+        return snapshot
+
+    def _probe_email_queue(self, db: Session) -> dict:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        # one grouped query over the recent partitions only
+        rows = db.execute(
+            select(EmailLog.status, func.count(), func.min(EmailLog.created_at))
+            .where(EmailLog.created_at >= now - QUEUED_LOOKBACK)
+            .group_by(EmailLog.status)
+        ).all()
+        counts = {status.value: 0 for status in EmailStatus}
+        oldest_queued = None
+        for status, count, oldest in rows:
+            counts[status] = count
+            if status == EmailStatus.QUEUED:
+                oldest_queued = oldest
+        heartbeat = db.execute(
+            select(JobHeartbeat.last_success_at, JobHeartbeat.last_failure_at, JobHeartbeat.last_error)
+            .where(JobHeartbeat.name == EMAIL_DRAIN_JOB)
+        ).first()
+        last_drain, last_failure, last_error = heartbeat or (None, None, None)
+        return {
+            "counts": counts,
+            "oldest_queued_age_seconds": round((now - oldest_queued).total_seconds(), 1) if oldest_queued else None,
+            "last_successful_drain": last_drain.isoformat() if last_drain else None,
+            "last_failed_drain": last_failure.isoformat() if last_failure else None,
+            # the most recent run failed
+            "last_drain_failed": last_failure is not None and (last_drain is None or last_failure > last_drain),
+            "last_drain_error": last_error,
+        }
+
+
+readiness_monitor = ReadinessMonitor()
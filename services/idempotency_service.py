@@ -0,0 +1,137 @@
+"""
+This module provides duplicate detection for form submissions.
+A submission is identified by the client `Idempotency-Key` header and by a hash of its content (email, subject
+and description). The client key is combined with the content hash, so a key alone never matches another form.
+A repeat only gets the id and status of the original form back: it is answered before the captcha is verified. Keys are stored in the unique-indexed form_idempotency_keys table with an expiry and
+looked up through an in-process TTL cache, so a replayed submission is answered without touching the write path.
+"""
+import datetime
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from models.form import ZaansrechtForm
+from models.idempotency import FormIdempotencyKey
+from schemas.forms import DuplicateSubmissionResponse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_TTL = datetime.timedelta(hours=int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", 24)))
+DUPLICATE_CONTENT_WINDOW = datetime.timedelta(minutes=int(os.getenv("DUPLICATE_CONTENT_WINDOW_MINUTES", 10)))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", 10000))
+
+
+class TTLCache:
+    """Small thread-safe LRU cache where every entry has its own expiry time."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict|None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+submission_cache = TTLCache(IDEMPOTENCY_CACHE_SIZE)
+
+
+def _sha256(*parts: str|None) -> str:
+    return hashlib.sha256("\x1f".join((part or "").strip() for part in parts).encode()).hexdigest()
+
+
+def submission_keys(
+        email: str,
+        subject: str|None,
+        description: str|None,
+        idempotency_key: str|None = None
+    ) -> dict[str, datetime.timedelta]:
+    """Return the lookup keys of a submission mapped to how long they stay valid."""
+    content_hash = _sha256(email.lower(), subject, description)
+    keys = {f"content:{content_hash}": DUPLICATE_CONTENT_WINDOW}
+    if idempotency_key:
+        # bound to the content, a key taken from another request does not find that form
+        keys[f"key:{_sha256(idempotency_key, content_hash)}"] = IDEMPOTENCY_KEY_TTL
+    return keys
+
+
+class IdempotencyService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def find_original_form(self, keys: dict[str, datetime.timedelta]) -> dict|None:
+        """Return the id and status of the form created earlier by one of the keys, or None for a new submission."""
+        for key in keys:
+            cached = submission_cache.get(key)
+            if cached is not None:
+                logger.info("Duplicate submission served from cache for form ID %d", cached["id"])
+                return cached
+
+        row = self.db.execute(
+            select(ZaansrechtForm.id, ZaansrechtForm.status, FormIdempotencyKey.expires_at)
+            .join(FormIdempotencyKey, FormIdempotencyKey.form_id == ZaansrechtForm.id)
+            .where(FormIdempotencyKey.key.in_(list(keys)), FormIdempotencyKey.expires_at > func.now())
+            .limit(1)
+        ).first()
+        if row is None:
+            return None
+        form_id, status, expires_at = row
+        response = DuplicateSubmissionResponse(id=form_id, status=status).model_dump(mode="json")
+        for key in keys:
+            submission_cache.set(key, response, expires_at.timestamp())
+        logger.info("Duplicate submission found for form ID %d", form_id)
+        return response
+
+    def claim_keys(self, form_id: int, keys: dict[str, datetime.timedelta]) -> bool:
+        """Store the keys for a freshly flushed form in the current transaction.
+        Expired keys are taken over. Returns False when a live key already belongs to another form,
+        which means a concurrent duplicate won the race."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        statement = insert(FormIdempotencyKey).values([
+            {"key": key, "form_id": form_id, "expires_at": now + ttl} for key, ttl in keys.items()
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=[FormIdempotencyKey.key],
+            set_={"form_id": statement.excluded.form_id, "expires_at": statement.excluded.expires_at},
+            where=FormIdempotencyKey.expires_at <= now,
+        ).returning(FormIdempotencyKey.key)
+        claimed = self.db.execute(statement).scalars().all()
+        return len(claimed) == len(keys)
+
+    def remember(self, form: ZaansrechtForm, keys: dict[str, datetime.timedelta]):
+        """Cache the duplicate response of a newly created form under all of its keys."""
+        response = DuplicateSubmissionResponse.model_validate(form).model_dump(mode="json")
+        now = time.time()
+        for key, ttl in keys.items():
+            submission_cache.set(key, response, now + ttl.total_seconds())
+
+    def purge_expired(self) -> int:
+        """Delete the expired keys."""
+        result = self.db.execute(delete(FormIdempotencyKey).where(FormIdempotencyKey.expires_at <= func.now()))
+        self.db.commit()
+        logger.info("Purged %d expired idempotency keys", result.rowcount)
+        return result.rowcount
@@ -0,0 +1,241 @@
+"""
+This module provides the IP reputation of form submitters.
+The blocked CIDR ranges in ip_blocklist are loaded into an in-memory binary radix trie that is rebuilt every
+IP_BLOCKLIST_REFRESH_SECONDS, so checking a request walks at most 32 (IPv4) or 128 (IPv6) nodes and never touches
+the database. The statistics group the submission logs per address and per subnet in single set-based queries.
+"""
+import asyncio
+import datetime
+import ipaddress
+import logging
+import os
+import time
+from sqlalchemy import String, case, cast, delete, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from configs.db import SessionLocal
+from models.form import FormSubmissionLog
+from models.ip_blocklist import BlockedNetwork
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+IP_BLOCKLIST_REFRESH_SECONDS = float(os.getenv("IP_BLOCKLIST_REFRESH_SECONDS", 60))
+IP_REPUTATION_WINDOW = datetime.timedelta(hours=int(os.getenv("IP_REPUTATION_WINDOW_HOURS", 24)))
+# subnet sizes the statistics group addresses by
+IPV4_SUBNET_PREFIX = int(os.getenv("IPV4_SUBNET_PREFIX", 24))
+IPV6_SUBNET_PREFIX = int(os.getenv("IPV6_SUBNET_PREFIX", 64))
+
+
+class CidrTrie:
+    """Binary radix trie of CIDR ranges, one per address family. A node is a list [zero, one, blocked]."""
+
+    def __init__(self, networks=()):
+        self._roots = {4: [None, None, False], 6: [None, None, False]}
+        self.size = 0
+        for network in networks:
+            self.add(network)
+
+    def add(self, network: ipaddress.IPv4Network | ipaddress.IPv6Network):
+        node = self._roots[network.version]
+        address = int(network.network_address)
+        for position in range(network.max_prefixlen - 1, network.max_prefixlen - 1 - network.prefixlen, -1):
+            bit = (address >> position) & 1
+            if node[2]:
+                # a shorter prefix already covers this range
+                return
+            if node[bit] is None:
+                node[bit] = [None, None, False]
+            node = node[bit]
+        if node[2]:
+            return
+        node[2] = True
+        # the longer prefixes below are covered now
+        self.size += 1 - self._count(node[0]) - self._count(node[1])
+        node[0] = node[1] = None
+
+    @classmethod
+    def _count(cls, node) -> int:
+        if node is None:
+            return 0
+        return 1 if node[2] else cls._count(node[0]) + cls._count(node[1])
+
+    def contains(self, address: ipaddress.IPv4Address | ipaddress.IPv6Address) -> bool:
+        """Whether any range in the trie contains the address."""
+        node = self._roots[address.version]
+        value = int(address)
+        position = address.max_prefixlen - 1
+        while node is not None:
+            if node[2]:
+                return True
+            node = node[(value >> position) & 1]
+            position -= 1
+        return False
+
+
+def parse_ip(value: str | None) -> ipaddress.IPv4Address | ipaddress.IPv6Address | None:
+    """Parse a client address, IPv4 mapped IPv6 addresses are treated as IPv4."""
+    try:
+        address = ipaddress.ip_address((value or "").strip())
+    except ValueError:
+        return None
+    if address.version == 6 and address.ipv4_mapped is not None:
+        return address.ipv4_mapped
+    return address
+
+
+class IpBlocklist:
+    """The blocked ranges of ip_blocklist as a trie, rebuilt in the background and swapped in one assignment."""
+
+    def __init__(self, interval: float = IP_BLOCKLIST_REFRESH_SECONDS):
+        self.interval = interval
+        self._trie = CidrTrie()
+        self._loaded_at = 0.0
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                # keep serving the previous blocklist
+                logger.error("Refreshing the IP blocklist failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def refresh(self):
+        trie = await asyncio.to_thread(self._load)
+        self._trie, self._loaded_at = trie, time.monotonic()
+
+    @staticmethod
+    def _load() -> CidrTrie:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        db = SessionLocal()
+        try:
+            networks = db.execute(
+                select(BlockedNetwork.network).where(
+                    or_(BlockedNetwork.expires_at.is_(None), BlockedNetwork.expires_at > now)
+                )
+            ).scalars().all()
+        finally:
+            db.close()
+        trie = CidrTrie(ipaddress.ip_network(network) for network in networks)
+        logger.info("Loaded %d blocked IP ranges", trie.size)
+        return trie
+
+    async def is_blocked(self, value: str | None) -> bool:
+        """Whether the address is in a blocked range. Without the refresh task (e.g. serverless) the
+        blocklist is reloaded at most once per interval."""
+        if self._task is None and time.monotonic() - self._loaded_at >= self.interval:
+            async with self._lock:
+                if time.monotonic() - self._loaded_at >= self.interval:
+                    try:
+                        await self.refresh()
+                    except Exception as e:
+                        self._loaded_at = time.monotonic()
+                        logger.error("Refreshing the IP blocklist failed: %s", e)
+        address = parse_ip(value)
+        return address is not None and self._trie.contains(address)
+
+
+class IpReputationService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def _since(window: datetime.timedelta) -> datetime.datetime:
+        return datetime.datetime.now(datetime.timezone.utc) - window
+
+    def ip_statistics(self, window: datetime.timedelta = IP_REPUTATION_WINDOW, limit: int = 50) -> list[dict]:
+        """Submissions per client address in the window, busiest first."""
+        submissions = func.count().label("submissions")
+        rows = self.db.execute(
+            select(
+                func.host(FormSubmissionLog.x_real_ip).label("ip"),
+                submissions,
+                func.min(FormSubmissionLog.created_at).label("first_seen"),
+                func.max(FormSubmissionLog.created_at).label("last_seen"),
+            )
+            .where(FormSubmissionLog.created_at >= self._since(window), FormSubmissionLog.x_real_ip.is_not(None))
+            .group_by(FormSubmissionLog.x_real_ip)
+            .order_by(submissions.desc())
+            .limit(limit)
+        ).mappings().all()
+        return [dict(row) for row in rows]
+
+    def subnet_statistics(
+            self,
+            window: datetime.timedelta = IP_REPUTATION_WINDOW,
+            limit: int = 50,
+            ipv4_prefix: int = IPV4_SUBNET_PREFIX,
+            ipv6_prefix: int = IPV6_SUBNET_PREFIX,
+        ) -> list[dict]:
+        """Submissions and distinct addresses per subnet (/24 and /64 by default) in the window, busiest first."""
+        ip = FormSubmissionLog.x_real_ip
+        prefix = case((func.family(ip) == 4, ipv4_prefix), else_=ipv6_prefix)
+        subnet = func.network(func.set_masklen(ip, prefix))
+        submissions = func.count().label("submissions")
+        rows = self.db.execute(
+            select(
+                cast(subnet, String).label("subnet"),
+                submissions,
+                func.count(ip.distinct()).label("addresses"),
+                func.max(FormSubmissionLog.created_at).label("last_seen"),
+            )
+            .where(FormSubmissionLog.created_at >= self._since(window), ip.is_not(None))
+            .group_by(subnet)
+            .order_by(submissions.desc())
+            .limit(limit)
+        ).mappings().all()
+        return [dict(row) for row in rows]
+
+    def network_submission_count(self, network: str, window: datetime.timedelta = IP_REPUTATION_WINDOW) -> int:
+        """Submissions from inside a range in the window, a containment filter served by the GiST index."""
+        return self.db.execute(
+            select(func.count())
+            .select_from(FormSubmissionLog)
+            .where(
+                FormSubmissionLog.created_at >= self._since(window),
+                FormSubmissionLog.x_real_ip.op("<<=")(func.cidr(network)),
+            )
+        ).scalar()
+
+    def list_blocked_networks(self) -> list[BlockedNetwork]:
+        return self.db.query(BlockedNetwork).order_by(BlockedNetwork.network).all()
+
+    def block_network(self, network: str, reason: str | None = None, expires_at: datetime.datetime | None = None):
+        """Add or update a blocked range. Processes pick it up with their next blocklist refresh."""
+        statement = insert(BlockedNetwork).values(network=network, reason=reason, expires_at=expires_at)
+        blocked = self.db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[BlockedNetwork.network],
+                set_={"reason": statement.excluded.reason, "expires_at": statement.excluded.expires_at},
+            ).returning(*BlockedNetwork.__table__.c)
+        ).mappings().one()
+        self.db.commit()
+        logger.warning("Blocked IP range %s: %s", network, reason)
+        return dict(blocked)
+
+    def unblock_network(self, network: str) -> bool:
+        result = self.db.execute(delete(BlockedNetwork).where(BlockedNetwork.network == network))
+        self.db.commit()
+        if result.rowcount:
+            logger.info("Unblocked IP range %s", network)
+        return bool(result.rowcount)
+
+
+ip_blocklist = IpBlocklist()
@@ -0,0 +1,231 @@
+"""
+This module provides the live event feed of the staff dashboards.
+Database triggers (see the live_events migration) send a NOTIFY on LIVE_EVENTS_CHANNEL when a Zaansrecht form is
+created or changes status and when an email log is created or changes status, whichever code path made the change.
+Each process holds one dedicated LISTEN connection and fans the events out to its SSE subscribers, each through a
+bounded in-memory queue. A subscriber that can not keep up is disconnected instead of buffering without limit; it
+reconnects with Last-Event-ID and gets the missed events from the replay buffer of the last LIVE_EVENTS_REPLAY_SIZE
+events. When the missed events are no longer buffered it gets a `reset` event and should reload its lists; the
+reset carries the id to resume from after reloading.
+Every listener receives the notifications in commit order, so the event order, and thereby the resume position,
+is the same in every process.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from configs.db import engine
+from enums import LiveEventTopic
+import exceptions as exceptions
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LIVE_EVENTS_CHANNEL = "live_events"
+LIVE_EVENTS_SEQUENCE = "live_event_id_seq"
+LIVE_EVENTS_REPLAY_SIZE = int(os.getenv("LIVE_EVENTS_REPLAY_SIZE", 1000))
+LIVE_EVENTS_QUEUE_SIZE = int(os.getenv("LIVE_EVENTS_QUEUE_SIZE", 100))
+LIVE_EVENTS_MAX_SUBSCRIBERS = int(os.getenv("LIVE_EVENTS_MAX_SUBSCRIBERS", 500))
+LIVE_EVENTS_HEARTBEAT_SECONDS = float(os.getenv("LIVE_EVENTS_HEARTBEAT_SECONDS", 15))
+LIVE_EVENTS_RETRY_MS = int(os.getenv("LIVE_EVENTS_RETRY_MS", 3000))
+LIVE_EVENTS_RECONNECT_MAX_DELAY = 30
+
+# the OS notices a dead listener connection within ~1 minute instead of waiting on it forever
+KEEPALIVE_PARAMS = {"keepalives": 1, "keepalives_idle": 30, "keepalives_interval": 10, "keepalives_count": 3}
+
+
+def format_event(event: str, data: dict, event_id: int | None = None) -> str:
+    """A message in the text/event-stream format."""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines += [f"event: {event}", f"data: {json.dumps(data, separators=(',', ':'))}"]
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscriber:
+    """The bounded queue of one SSE client. Overflowing it closes the stream, the client resumes by reconnecting."""
+
+    def __init__(self, topics: set[LiveEventTopic], queue_size: int = LIVE_EVENTS_QUEUE_SIZE):
+        self.topics = topics
+        self.queue_size = queue_size
+        self.closed = False
+        self.overflowed = False
+        self._messages: deque[str] = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, message: str):
+        if self.closed:
+            return
+        if len(self._messages) >= self.queue_size:
+            self.overflowed = True
+            self.close()
+            return
+        self._messages.append(message)
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def next_messages(self, timeout: float) -> list[str]:
+        """The queued messages, waiting up to `timeout` seconds for one. Empty on timeout or when closed."""
+        if not self._messages and not self.closed:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._ready.clear()
+        if self.closed:
+            return []
+        messages = list(self._messages)
+        self._messages.clear()
+        return messages
+
+
+class LiveEventHub:
+    """One LISTEN connection per process, fanned out to the subscribers. Listens from the first subscriber on."""
+
+    def __init__(self, replay_size: int = LIVE_EVENTS_REPLAY_SIZE, max_subscribers: int = LIVE_EVENTS_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._subscribers: set[Subscriber] = set()
+        # (event id, topic, message) in arrival order
+        self._replay: deque[tuple[int, LiveEventTopic, str]] = deque(maxlen=replay_size)
+        # resume position before the first buffered event: the event id sequence value when the listener connected,
+        # then the id of the last event pushed out of the buffer
+        self._start_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self.dropped = 0
+
+    def stats(self) -> dict:
+        return {
+            "listening": self._task is not None,
+            "subscribers": len(self._subscribers),
+            "buffered": len(self._replay),
+            "dropped": self.dropped,
+        }
+
+    def subscribe(self, topics: set[LiveEventTopic], last_event_id: str | None = None) -> tuple[Subscriber, list[str]]:
+        """Register a subscriber and return it with the messages to send first: the events after `last_event_id`,
+        or a reset event when those are no longer buffered."""
+        if len(self._subscribers) >= self.max_subscribers:
+            raise exceptions.TooManySubscribersException(f"{len(self._subscribers)} live event subscribers")
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+        subscriber = Subscriber(topics)
+        # no await between the replay and the registration, so no event falls in between
+        replay = [] if last_event_id is None else self._replay_after(last_event_id, topics)
+        self._subscribers.add(subscriber)
+        return subscriber, replay
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+        if subscriber.overflowed:
+            self.dropped += 1
+
+    def _replay_after(self, last_event_id: str, topics: set[LiveEventTopic]) -> list[str]:
+        try:
+            event_id = int(last_event_id)
+        except ValueError:
+            return [self._reset_message()]
+        if event_id == self._start_id:
+            position = 0
+        else:
+            ids = [buffered_id for buffered_id, _, _ in self._replay]
+            try:
+                position = ids.index(event_id) + 1
+            except ValueError:
+                return [self._reset_message()]
+        return [message for _, topic, message in list(self._replay)[position:] if topic in topics]
+
+    def _reset_message(self) -> str:
+        # carries the latest id, a client that reloaded its lists resumes from there
+        latest = self._replay[-1][0] if self._replay else self._start_id
+        return format_event("reset", {"reason": "missed events are no longer available"}, latest)
+
+    async def stop(self):
+        for subscriber in tuple(self._subscribers):
+            subscriber.close()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def dispatch(self, payload: str):
+        """Buffer a notification and queue it for the subscribers of its topic."""
+        try:
+            notification = json.loads(payload)
+            topic = LiveEventTopic(notification.pop("topic"))
+            event_id = notification.pop("event_id")
+            event = f"{topic.value}.{notification.pop('event')}"
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error("Ignoring malformed live event %r: %s", payload, e)
+            return
+        message = format_event(event, notification, event_id)
+        if len(self._replay) == self._replay.maxlen:
+            self._start_id = self._replay[0][0]
+        self._replay.append((event_id, topic, message))
+        for subscriber in tuple(self._subscribers):
+            if topic in subscriber.topics:
+                subscriber.push(message)
+
+    def _broadcast_reset(self):
+        message = self._reset_message()
+        for subscriber in tuple(self._subscribers):
+            subscriber.push(message)
+
+    @staticmethod
+    def _connect():
+        """Open the LISTEN connection. Returns it with the event id sequence value read right after LISTEN, every
+        event received on the connection comes after that position."""
+        cargs, cparams = engine.dialect.create_connect_args(engine.url)
+        connection = engine.dialect.connect(*cargs, **{**cparams, **KEEPALIVE_PARAMS})
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {LIVE_EVENTS_CHANNEL}")
+            cursor.execute(f"SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {LIVE_EVENTS_SEQUENCE}")
+            start_id = cursor.fetchone()[0]
+        return connection, start_id
+
+    async def _listen(self):
+        loop = asyncio.get_running_loop()
+        delay = 1
+        connected_before = False
+        while True:
+            try:
+                connection, start_id = await asyncio.to_thread(self._connect)
+            except Exception as e:
+                logger.error("Connecting the live event listener failed, retrying in %ds: %s", delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LIVE_EVENTS_RECONNECT_MAX_DELAY)
+                continue
+            logger.info("Listening for live events on %s", LIVE_EVENTS_CHANNEL)
+            delay = 1
+            # notifications sent while disconnected are lost, the buffered events no longer connect to new ones
+            self._replay.clear()
+            self._start_id = start_id
+            if connected_before:
+                self._broadcast_reset()
+            connected_before = True
+            readable = asyncio.Event()
+            fileno = connection.fileno()
+            loop.add_reader(fileno, readable.set)
+            try:
+                while True:
+                    await readable.wait()
+                    readable.clear()
+                    connection.poll()
+                    while connection.notifies:
+                        self.dispatch(connection.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error("Live event listener connection lost: %s", e)
+            finally:
+                loop.remove_reader(fileno)
+                connection.close()
+
+
+live_events = LiveEventHub()
@@ -0,0 +1,197 @@
+"""
+This module provides the retention services for the append-only log tables and the forms.
+`email_logs` and `form_submission_log` are partitioned per month on `created_at`. This service keeps
+partitions available ahead of time, archives expired partitions to gzip compressed CSV files before dropping them,
+and moves old forms to the ARCHIVED status in small chunks so the table is never locked for long.
+Emails still queued after QUEUED_EMAIL_LOOKBACK_DAYS are marked FAILED: the drain and the readiness probe only look
+at the recent partitions and would never see them again.
+"""
+import datetime
+import gzip
+import logging
+import os
+import re
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import text
+from models.form import ZaansrechtForm
+from models.email_log import EmailLog
+from services.emai_service import QUEUED_LOOKBACK
+from enums import EmailStatus, FormStatus
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("email_logs", "form_submission_log")
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", 3))
+LOG_RETENTION_MONTHS = int(os.getenv("LOG_RETENTION_MONTHS", 12))
+PARTITION_ARCHIVE_DIR = os.getenv("PARTITION_ARCHIVE_DIR", "archives")
+FORM_ARCHIVE_AFTER_DAYS = int(os.getenv("FORM_ARCHIVE_AFTER_DAYS", 180))
+FORM_ARCHIVE_CHUNK_SIZE = int(os.getenv("FORM_ARCHIVE_CHUNK_SIZE", 500))
+
+PARTITION_NAME_PATTERN = re.compile(r"^(?P<table>\w+)_p(?P<year>\d{4})(?P<month>\d{2})$")
+
+
+def add_months(month: datetime.date, months: int) -> datetime.date:
+    """Return the first day of the month `months` away from the given month."""
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime.date) -> str:
+    """Name of the monthly partition, e.g. email_logs_p202510."""
+    return f"{table}_p{month:%Y%m}"
+
+
+class RetentionService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def list_partitions(self, table: str) -> dict[str, datetime.date]:
+        """Return the monthly partitions of a table mapped to the month they hold."""
+        rows = self.db.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+                "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+                "WHERE parent.relname = :table"
+            ),
+            {"table": table},
+        ).scalars()
+        partitions = {}
+        for name in rows:
+            match = PARTITION_NAME_PATTERN.match(name)
+            if match and match.group("table") == table:
+                partitions[name] = datetime.date(int(match.group("year")), int(match.group("month")), 1)
+        return partitions
+
+    def ensure_partitions(self, months_ahead: int = PARTITION_MONTHS_AHEAD) -> list[str]:
+        """Create the monthly partitions from the current month up to `months_ahead` months in the future."""
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        current_month = datetime.date(today.year, today.month, 1)
+        created = []
+        for table in PARTITIONED_TABLES:
+            existing = self.list_partitions(table)
+            for offset in range(months_ahead + 1):
+                month = add_months(current_month, offset)
+                name = partition_name(table, month)
+                if name in existing:
+                    continue
+                self._create_partition(table, name, month)
+                created.append(name)
+                logger.info("Created partition %s", name)
+        self.db.commit()
+        return created
+
+    def _create_partition(self, table: str, name: str, month: datetime.date):
+        """Create the partition of a month. Rows of that month that landed in the DEFAULT partition (the cron did not
+        run in time) make CREATE ... PARTITION OF fail, they are moved into the new partition before attaching it."""
+        bounds = {"start": month.isoformat(), "end": add_months(month, 1).isoformat()}
+        default = f"{table}_default"
+        stranded = 0
+        if self.db.execute(text("SELECT to_regclass(:name)"), {"name": default}).scalar():
+            stranded = self.db.execute(
+                text(f"SELECT count(*) FROM {default} WHERE created_at >= :start AND created_at < :end"), bounds
+            ).scalar()
+        if not stranded:
+            self.db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+            ))
+            return
+        logger.warning("Moving %d rows of %s from %s into the new partition %s", stranded, bounds["start"], default, name)
+        self.db.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"))
+        self.db.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {default} WHERE created_at >= :start AND created_at < :end RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ),
+            bounds,
+        )
+        # attaching creates the indexes and triggers of the parent on the partition
+        self.db.execute(text(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+        ))
+
+    def fail_expired_queued_emails(self, lookback: datetime.timedelta = QUEUED_LOOKBACK) -> int:
+        """Mark emails still QUEUED or SENDING after `lookback` as FAILED, so they do not silently disappear."""
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - lookback
+        result = self.db.execute(
+            update(EmailLog)
+            .where(EmailLog.status.in_((EmailStatus.QUEUED, EmailStatus.SENDING)), EmailLog.created_at < cutoff)
+            .values(status=EmailStatus.FAILED, error_message=f"Not sent within {lookback.days} days")
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        if result.rowcount:
+            logger.error("Marked %d emails queued before %s as FAILED", result.rowcount, cutoff)
+        return result.rowcount
+
+    def archive_expired_partitions(
+            self,
+            retention_months: int = LOG_RETENTION_MONTHS,
+            archive_dir: str = PARTITION_ARCHIVE_DIR
+        ) -> list[str]:
+        """Dump every partition older than the retention window to a gzip CSV file and drop it."""
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        cutoff = add_months(datetime.date(today.year, today.month, 1), -retention_months)
+        os.makedirs(archive_dir, exist_ok=True)
+
+        archived = []
+        for table in PARTITIONED_TABLES:
+            for name, month in sorted(self.list_partitions(table).items(), key=lambda item: item[1]):
+                if month >= cutoff:
+                    continue
+                archive_file = os.path.join(archive_dir, f"{name}.csv.gz")
+                self._dump_partition(name, archive_file)
+                # detach first so the drop only locks the partition and not the parent table
+                self.db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                self.db.execute(text(f"DROP TABLE {name}"))
+                self.db.commit()
+                archived.append(archive_file)
+                logger.info("Archived partition %s to %s", name, archive_file)
+        return archived
+
+    def _dump_partition(self, name: str, archive_file: str):
+        """Stream a partition to a compressed CSV file using COPY, without loading rows in Python."""
+        cursor = self.db.connection().connection.cursor()
+        try:
+            with gzip.open(archive_file, "wb") as fh:
+                cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", fh)
+        finally:
+            cursor.close()
+
+    def archive_old_forms(
+            self,
+            older_than_days: int = FORM_ARCHIVE_AFTER_DAYS,
+            chunk_size: int = FORM_ARCHIVE_CHUNK_SIZE
+        ) -> int:
+        """Move forms without activity for `older_than_days` to ARCHIVED, committing per chunk."""
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=older_than_days)
+        total = 0
+        while True:
+            chunk = (
+                select(ZaansrechtForm.id)
+                .where(
+                    ZaansrechtForm.status != FormStatus.ARCHIVED,
+                    func.coalesce(ZaansrechtForm.updated_at, ZaansrechtForm.created_at) < cutoff,
+                )
+                .limit(chunk_size)
+                .with_for_update(skip_locked=True)
+            )
+            result = self.db.execute(
+                update(ZaansrechtForm)
+                .where(ZaansrechtForm.id.in_(chunk.scalar_subquery()))
+                .values(status=FormStatus.ARCHIVED)
+                .execution_options(synchronize_session=False)
+            )
+            self.db.commit()
+            total += result.rowcount
+            logger.debug("Archived chunk of %d forms", result.rowcount)
+            if result.rowcount < chunk_size:
+                break
+        logger.info("Archived %d forms older than %s", total, cutoff)
+        return total
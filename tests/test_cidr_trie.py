@@ -0,0 +1,47 @@
+import ipaddress
+from services.ip_reputation_service import CidrTrie, parse_ip
+
+
+def networks(*values):
+    return [ipaddress.ip_network(value) for value in values]
+
+
+def test_contains_addresses_inside_the_ranges():
+    trie = CidrTrie(networks("10.0.0.0/8", "192.168.1.0/24", "2001:db8::/32"))
+    assert trie.contains(ipaddress.ip_address("10.255.0.1"))
+    assert trie.contains(ipaddress.ip_address("192.168.1.200"))
+    assert trie.contains(ipaddress.ip_address("2001:db8::1"))
+    assert not trie.contains(ipaddress.ip_address("192.168.2.1"))
+    assert not trie.contains(ipaddress.ip_address("11.0.0.1"))
+    assert not trie.contains(ipaddress.ip_address("2001:db9::1"))
+
+
+def test_address_families_are_separate():
+    trie = CidrTrie(networks("0.0.0.0/0"))
+    assert trie.contains(ipaddress.ip_address("203.0.113.7"))
+    assert not trie.contains(ipaddress.ip_address("::1"))
+
+
+def test_single_address_range():
+    trie = CidrTrie(networks("203.0.113.7/32"))
+    assert trie.contains(ipaddress.ip_address("203.0.113.7"))
+    assert not trie.contains(ipaddress.ip_address("203.0.113.6"))
+
+
+def test_covered_ranges_are_not_counted():
+    trie = CidrTrie(networks("10.1.0.0/16", "10.0.0.0/8", "10.2.3.0/24", "10.0.0.0/8"))
+    assert trie.size == 1
+    assert trie.contains(ipaddress.ip_address("10.1.2.3"))
+
+
+def test_empty_trie_contains_nothing():
+    trie = CidrTrie()
+    assert trie.size == 0
+    assert not trie.contains(ipaddress.ip_address("127.0.0.1"))
+
+
+def test_parse_ip():
+    assert parse_ip(" 203.0.113.7 ") == ipaddress.ip_address("203.0.113.7")
+    assert parse_ip("::ffff:203.0.113.7") == ipaddress.ip_address("203.0.113.7")
+    assert parse_ip("unknown") is None
+    assert parse_ip(None) is None
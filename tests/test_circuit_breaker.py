@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+import exceptions as exceptions
+from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+async def succeed():
+    return "ok"
+
+
+async def fail():
+    raise ConnectionError("refused")
+
+
+async def hang():
+    await asyncio.sleep(1)
+
+
+def call(breaker: CircuitBreaker, func):
+    return asyncio.run(breaker.call(func))
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test-open", call_timeout=1, failure_threshold=2, reset_timeout=60)
+    for _ in range(2):
+        with pytest.raises(exceptions.UpstreamUnavailableException):
+            call(breaker, fail)
+    assert breaker.state == OPEN
+    with pytest.raises(exceptions.CircuitOpenException):
+        call(breaker, succeed)
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker("test-reset", call_timeout=1, failure_threshold=2)
+    with pytest.raises(exceptions.UpstreamUnavailableException):
+        call(breaker, fail)
+    assert call(breaker, succeed) == "ok"
+    with pytest.raises(exceptions.UpstreamUnavailableException):
+        call(breaker, fail)
+    assert breaker.state == CLOSED
+    assert breaker.failures == 1
+
+
+def test_timeout_counts_as_failure():
+    breaker = CircuitBreaker("test-timeout", call_timeout=0.01, failure_threshold=1)
+    with pytest.raises(exceptions.UpstreamUnavailableException, match="timed out"):
+        call(breaker, hang)
+    assert breaker.state == OPEN
+
+
+def test_other_exceptions_are_not_failures():
+    breaker = CircuitBreaker("test-filter", call_timeout=1, failure_threshold=1, failure_exceptions=(ConnectionError,))
+
+    async def invalid():
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        call(breaker, invalid)
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker("test-probe", call_timeout=1, failure_threshold=1, reset_timeout=0)
+    with pytest.raises(exceptions.UpstreamUnavailableException):
+        call(breaker, fail)
+    # the reset timeout has passed, the next call is the probe
+    with pytest.raises(exceptions.UpstreamUnavailableException):
+        call(breaker, fail)
+    assert breaker.state == OPEN
+    assert call(breaker, succeed) == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_one_probe_at_a_time():
+    breaker = CircuitBreaker("test-single-probe", call_timeout=1, failure_threshold=1, reset_timeout=0)
+    with pytest.raises(exceptions.UpstreamUnavailableException):
+        call(breaker, fail)
+
+    async def probe_and_call():
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "ok"
+
+        probe = asyncio.create_task(breaker.call(slow))
+        await asyncio.sleep(0)
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(exceptions.CircuitOpenException):
+            await breaker.call(succeed)
+        release.set()
+        return await probe
+
+    assert asyncio.run(probe_and_call()) == "ok"
+    assert breaker.state == CLOSED
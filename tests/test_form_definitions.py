@@ -0,0 +1,81 @@
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+import schemas.form_definitions as form_definitions
+from schemas.form_definitions import FormDefinition, FormField, get_form_definition, register_form_definition
+from routers.form import get_compiled_form_definition
+
+CALLBACK_FORM = FormDefinition(
+    name="callback_request",
+    title="Callback request",
+    email_field="email",
+    fields={
+        "email": FormField(type="email", required=True),
+        "name": FormField(type="str", required=True, max_length=20),
+        "call_back_on": FormField(type="date"),
+        "urgent": FormField(type="bool"),
+        "attempts": FormField(type="int"),
+    },
+)
+
+
+@pytest.fixture
+def callback_form(monkeypatch):
+    monkeypatch.setattr(form_definitions, "_registry", {})
+    return register_form_definition(CALLBACK_FORM)
+
+
+def test_registered_definition_is_cached(callback_form):
+    assert get_form_definition("callback_request") is callback_form
+    assert get_compiled_form_definition("callback_request") is callback_form
+    assert callback_form.model.__name__ == "CallbackRequestSubmission"
+    assert form_definitions.list_form_definitions() == [CALLBACK_FORM]
+
+
+def test_unknown_form_type_is_a_404(callback_form):
+    with pytest.raises(HTTPException) as error:
+        get_compiled_form_definition("unknown")
+    assert error.value.status_code == 404
+
+
+def test_reserved_form_type_can_not_be_registered(callback_form):
+    with pytest.raises(ValueError, match="has its own model"):
+        register_form_definition(CALLBACK_FORM.model_copy(update={"name": "zaansrecht"}))
+    assert get_form_definition("zaansrecht") is None
+
+
+def test_email_field_must_be_a_field(callback_form):
+    with pytest.raises(ValueError, match="is not a field"):
+        register_form_definition(CALLBACK_FORM.model_copy(update={"name": "other", "email_field": "mail"}))
+
+
+def test_validate_returns_the_json_payload(callback_form):
+    payload = callback_form.validate({"email": "jan@example.nl", "name": "  Jan  ", "call_back_on": "2026-11-02"})
+    # stripped, serialized to JSON values and without the empty optional fields
+    assert payload == {"email": "jan@example.nl", "name": "Jan", "call_back_on": "2026-11-02"}
+
+
+@pytest.mark.parametrize("data", [
+    {"name": "Jan"},
+    {"email": "not an email", "name": "Jan"},
+    {"email": "jan@example.nl", "name": "J" * 21},
+    {"email": "jan@example.nl", "name": "Jan", "unknown": "field"},
+    {"email": "jan@example.nl", "name": "Jan", "attempts": "many"},
+])
+def test_validate_rejects_invalid_submissions(callback_form, data):
+    with pytest.raises(ValidationError):
+        callback_form.validate(data)
+
+
+def test_parse_filters_converts_to_json_values(callback_form):
+    filters = {"urgent": "true", "attempts": "3", "call_back_on": "2026-11-02", "name": "Jan"}
+    assert callback_form.parse_filters(filters) == {
+        "urgent": True, "attempts": 3, "call_back_on": "2026-11-02", "name": "Jan",
+    }
+
+
+def test_parse_filters_rejects_unknown_fields_and_invalid_values(callback_form):
+    with pytest.raises(ValueError, match="Unknown field"):
+        callback_form.parse_filters({"meeting_type": "virtual"})
+    with pytest.raises(ValueError, match="Invalid value"):
+        callback_form.parse_filters({"attempts": "many"})
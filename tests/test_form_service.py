@@ -0,0 +1,44 @@
+import pytest
+import exceptions as exceptions
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from enums import FormStatus
+from models.form import ZaansrechtForm
+from services.form_service import FormService
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    ZaansrechtForm.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def add_form(db: Session, description: str | None = "Long description " * 50) -> ZaansrechtForm:
+    form = ZaansrechtForm(full_name="Jan Jansen", email="jan@example.nl", terms_accepted=True, description=description)
+    db.add(form)
+    db.commit()
+    return form
+
+
+def test_status_update_returns_the_description(db):
+    form = add_form(db)
+    updated = FormService(db).update_form_status(form.id, FormStatus.VIEWED)
+    assert updated["status"] == FormStatus.VIEWED
+    assert updated["description"] == "Long description " * 50
+    assert "description_compressed" not in updated
+
+
+def test_bulk_status_update_returns_the_descriptions(db):
+    first, second = add_form(db), add_form(db, description=None)
+    updated = FormService(db).bulk_update_form_status(FormStatus.ARCHIVED, form_ids=[first.id, second.id])
+    descriptions = {form["id"]: form["description"] for form in updated}
+    assert descriptions == {first.id: "Long description " * 50, second.id: None}
+
+
+def test_refused_transition_is_reported(db):
+    form = add_form(db)
+    with pytest.raises(exceptions.InvalidStatusTransitionException):
+        FormService(db).update_form_status(form.id, FormStatus.NEW, enforce_transitions=True)
@@ -0,0 +1,31 @@
+import time
+from services.idempotency_service import TTLCache, submission_keys
+
+
+def test_returns_values_until_they_expire():
+    cache = TTLCache(max_size=10)
+    cache.set("live", {"id": 1}, time.time() + 60)
+    cache.set("expired", {"id": 2}, time.time() - 1)
+    assert cache.get("live") == {"id": 1}
+    assert cache.get("expired") is None
+    assert cache.get("missing") is None
+
+
+def test_evicts_the_least_recently_used_entry():
+    cache = TTLCache(max_size=2)
+    expires_at = time.time() + 60
+    cache.set("a", {"id": 1}, expires_at)
+    cache.set("b", {"id": 2}, expires_at)
+    cache.get("a")
+    cache.set("c", {"id": 3}, expires_at)
+    assert cache.get("b") is None
+    assert cache.get("a") == {"id": 1}
+    assert cache.get("c") == {"id": 3}
+
+
+def test_idempotency_key_is_bound_to_the_content():
+    first = submission_keys("A@example.nl", "Subject", "Text", idempotency_key="key-1")
+    same = submission_keys("a@example.nl", "Subject", "Text", idempotency_key="key-1")
+    other_content = submission_keys("a@example.nl", "Subject", "Other text", idempotency_key="key-1")
+    assert first == same
+    assert not set(first) & set(other_content)
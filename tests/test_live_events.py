@@ -0,0 +1,133 @@
+import asyncio
+import json
+from enums import LiveEventTopic
+from services.live_events_service import LiveEventHub, Subscriber, format_event
+
+ALL_TOPICS = set(LiveEventTopic)
+
+
+def notification(event_id: int, topic: str = "form", event: str = "status", **fields) -> str:
+    return json.dumps({"event_id": event_id, "topic": topic, "event": event, "id": 1, "status": "NEW", **fields})
+
+
+def hub_with_events(*events: tuple[int, str], replay_size: int = 10) -> LiveEventHub:
+    hub = LiveEventHub(replay_size=replay_size)
+    for event_id, topic in events:
+        hub.dispatch(notification(event_id, topic))
+    return hub
+
+
+def event_ids(messages: list[str]) -> list[int | None]:
+    ids = []
+    for message in messages:
+        id_lines = [line for line in message.splitlines() if line.startswith("id: ")]
+        ids.append(int(id_lines[0][4:]) if id_lines else None)
+    return ids
+
+
+def test_format_event():
+    assert format_event("form.status", {"id": 1}, 7) == 'id: 7\nevent: form.status\ndata: {"id":1}\n\n'
+    assert format_event("reset", {}) == "event: reset\ndata: {}\n\n"
+
+
+def test_subscriber_returns_queued_messages():
+    subscriber = Subscriber(ALL_TOPICS, queue_size=3)
+    subscriber.push("a")
+    subscriber.push("b")
+    assert asyncio.run(subscriber.next_messages(1)) == ["a", "b"]
+    assert asyncio.run(subscriber.next_messages(0.01)) == []
+
+
+def test_subscriber_closes_on_overflow():
+    subscriber = Subscriber(ALL_TOPICS, queue_size=2)
+    for message in ("a", "b", "c"):
+        subscriber.push(message)
+    assert subscriber.overflowed
+    assert subscriber.closed
+    assert asyncio.run(subscriber.next_messages(1)) == []
+
+
+def test_close_wakes_a_waiting_subscriber():
+    async def scenario():
+        subscriber = Subscriber(ALL_TOPICS)
+        waiting = asyncio.create_task(subscriber.next_messages(10))
+        await asyncio.sleep(0)
+        subscriber.close()
+        return await asyncio.wait_for(waiting, 1)
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_push_after_close_is_ignored():
+    subscriber = Subscriber(ALL_TOPICS)
+    subscriber.close()
+    subscriber.push("a")
+    assert not subscriber.overflowed
+    assert asyncio.run(subscriber.next_messages(0.01)) == []
+
+
+def test_replay_after_a_buffered_event():
+    hub = hub_with_events((1, "form"), (2, "email"), (3, "form"))
+    assert event_ids(hub._replay_after("1", ALL_TOPICS)) == [2, 3]
+    assert hub._replay_after("3", ALL_TOPICS) == []
+
+
+def test_replay_filters_on_topic():
+    hub = hub_with_events((1, "form"), (2, "email"), (3, "form"))
+    assert event_ids(hub._replay_after("1", {LiveEventTopic.FORM})) == [3]
+
+
+def test_replay_of_a_missing_event_is_a_reset():
+    hub = hub_with_events((1, "form"), (2, "email"))
+    for last_event_id in ("99", "not-a-number"):
+        [message] = hub._replay_after(last_event_id, ALL_TOPICS)
+        assert message.startswith("id: 2\nevent: reset\n")
+
+
+def test_reset_resumes_from_the_listener_start_position():
+    hub = LiveEventHub(replay_size=10)
+    hub._start_id = 41
+    [reset] = hub._replay_after("7", ALL_TOPICS)
+    assert reset.startswith("id: 41\nevent: reset\n")
+    hub.dispatch(notification(42))
+    hub.dispatch(notification(43))
+    assert event_ids(hub._replay_after("41", ALL_TOPICS)) == [42, 43]
+
+
+def test_events_pushed_out_of_the_buffer_move_the_start_position():
+    hub = hub_with_events((1, "form"), (2, "form"), (3, "form"), replay_size=2)
+    assert hub._start_id == 1
+    assert event_ids(hub._replay_after("1", ALL_TOPICS)) == [2, 3]
+    assert event_ids(hub._replay_after("0", ALL_TOPICS)) == [3]
+
+
+def test_dispatch_queues_events_for_subscribers_of_the_topic():
+    hub = LiveEventHub()
+    forms, emails = Subscriber({LiveEventTopic.FORM}), Subscriber({LiveEventTopic.EMAIL})
+    hub._subscribers.update((forms, emails))
+    hub.dispatch(notification(1, "form", "created"))
+    [message] = asyncio.run(forms.next_messages(1))
+    assert message.startswith("id: 1\nevent: form.created\n")
+    assert asyncio.run(emails.next_messages(0.01)) == []
+
+
+def test_dispatch_ignores_malformed_payloads():
+    hub = LiveEventHub()
+    subscriber = Subscriber(ALL_TOPICS)
+    hub._subscribers.add(subscriber)
+    for payload in ("not json", "[]", json.dumps({"event_id": 1, "topic": "unknown", "event": "created"}),
+                    json.dumps({"topic": "form", "event": "created"})):
+        hub.dispatch(payload)
+    assert hub.stats()["buffered"] == 0
+    assert asyncio.run(subscriber.next_messages(0.01)) == []
+
+
+def test_overflowed_subscriber_is_counted_as_dropped():
+    hub = LiveEventHub()
+    subscriber = Subscriber(ALL_TOPICS, queue_size=1)
+    hub._subscribers.add(subscriber)
+    hub.dispatch(notification(1))
+    hub.dispatch(notification(2))
+    hub.unsubscribe(subscriber)
+    assert hub.stats()["dropped"] == 1
+    assert hub.stats()["subscribers"] == 0
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from middlewares.load_shedding import AdmissionController
+
+
+def controller(**kwargs) -> AdmissionController:
+    settings = {"max_in_flight": 1, "write_queue_depth": 1, "read_queue_depth": 1,
+                "write_max_wait": 1, "read_max_wait": 1}
+    return AdmissionController(**{**settings, **kwargs})
+
+
+def test_admits_up_to_max_in_flight():
+    async def scenario():
+        admission = controller(max_in_flight=2, read_max_wait=0.01)
+        assert await admission.acquire(is_write=False)
+        assert await admission.acquire(is_write=True)
+        assert not await admission.acquire(is_write=False)
+        admission.release()
+        assert admission.in_flight == 1
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert admission.rejected == 1
+
+
+def test_rejects_when_the_queue_is_full():
+    async def scenario():
+        admission = controller(read_queue_depth=1)
+        await admission.acquire(is_write=False)
+        waiting = asyncio.create_task(admission.acquire(is_write=False))
+        await asyncio.sleep(0)
+        assert not await admission.acquire(is_write=False)
+        admission.release()
+        assert await waiting
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert admission.in_flight == 1
+    assert admission.rejected == 1
+
+
+def test_released_slot_goes_to_a_waiting_write_first():
+    async def scenario():
+        admission = controller()
+        await admission.acquire(is_write=False)
+        read = asyncio.create_task(admission.acquire(is_write=False))
+        await asyncio.sleep(0)
+        write = asyncio.create_task(admission.acquire(is_write=True))
+        await asyncio.sleep(0)
+        admission.release()
+        await asyncio.sleep(0)
+        assert write.done() and write.result()
+        assert not read.done()
+        admission.release()
+        assert await read
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        admission = controller()
+        await admission.acquire(is_write=True)
+        waiting = asyncio.create_task(admission.acquire(is_write=True))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert admission.stats()["waiting_writes"] == 0
+        admission.release()
+        return admission
+
+    assert asyncio.run(scenario()).in_flight == 0
+
+
+def test_slot_handed_over_as_the_wait_times_out_is_used():
+    async def scenario():
+        admission = controller(write_max_wait=0.01)
+        await admission.acquire(is_write=True)
+        waiting = asyncio.create_task(admission.acquire(is_write=True))
+        await asyncio.sleep(0)
+        # block past the wait budget, so the timeout fires right after the release below
+        time.sleep(0.02)
+        await asyncio.sleep(0)
+        admission.release()
+        assert await waiting
+        admission.release()
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert admission.in_flight == 0
+    assert admission.rejected == 0
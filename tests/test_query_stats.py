@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import create_engine, text
+from configs.query_stats import (
+    QueryStats, assert_max_queries, capture_queries, current_query_stats, instrument_engine, redact_parameters,
+)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+    yield engine
+    engine.dispose()
+
+
+def test_capture_queries_counts_statements(engine):
+    with capture_queries() as stats:
+        with engine.begin() as connection:
+            connection.execute(text("INSERT INTO items (name) VALUES (:name)"), {"name": "a"})
+            for _ in range(3):
+                connection.execute(text("SELECT name FROM items"))
+    assert stats.count == 4
+    assert stats.statements["SELECT name FROM items"] == 3
+    assert stats.repeated() == [("SELECT name FROM items", 3)]
+
+
+def test_capture_queries_ignores_statements_outside_the_block(engine):
+    with capture_queries() as stats:
+        pass
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    assert stats.count == 0
+
+
+def test_assert_max_queries_passes_within_budget(engine):
+    with assert_max_queries(2):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            connection.execute(text("SELECT 2"))
+
+
+def test_assert_max_queries_lists_statements_over_budget(engine):
+    with pytest.raises(AssertionError, match="3 queries executed, the budget is 2") as error:
+        with assert_max_queries(2):
+            with engine.connect() as connection:
+                for _ in range(3):
+                    connection.execute(text("SELECT 1"))
+    assert "3x SELECT 1" in str(error.value)
+
+
+def test_request_stats_are_recorded_in_the_context(engine):
+    stats = QueryStats()
+    token = current_query_stats.set(stats)
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    finally:
+        current_query_stats.reset(token)
+    assert stats.count == 1
+    assert stats.duration_ms >= 0
+
+
+def test_failed_statement_does_not_leak_its_start_time(engine):
+    with engine.connect() as connection:
+        with pytest.raises(Exception):
+            connection.execute(text("SELECT * FROM missing_table"))
+        connection.execute(text("SELECT 1"))
+        assert connection.info["query_start_times"] == []
+
+
+def test_redact_parameters():
+    assert redact_parameters({"email": "a@b.nl", "id": 1}) == {"email": "str", "id": "int"}
+    assert redact_parameters(("a@b.nl", 1)) == ["str", "int"]
+    assert redact_parameters([{"id": 1}, {"id": 2}]) == "<2 parameter sets>"
@@ -0,0 +1,28 @@
+from dependencies.rate_limit import InMemoryRateLimiter
+
+
+def test_admits_max_requests_per_window():
+    limiter = InMemoryRateLimiter(max_requests=2, window_seconds=60)
+    assert limiter._hit("203.0.113.7", 0) == 0
+    assert limiter._hit("203.0.113.7", 1) == 0
+    assert limiter._hit("203.0.113.7", 2) == 58
+    # other keys have their own window
+    assert limiter._hit("203.0.113.8", 2) == 0
+
+
+def test_window_slides():
+    limiter = InMemoryRateLimiter(max_requests=2, window_seconds=60)
+    limiter._hit("key", 0)
+    limiter._hit("key", 30)
+    assert limiter._hit("key", 59) == 1
+    assert limiter._hit("key", 60) == 0
+    assert limiter._hit("key", 61) == 29
+
+
+def test_sweep_drops_idle_keys():
+    limiter = InMemoryRateLimiter(max_requests=1, window_seconds=60)
+    limiter.SWEEP_EVERY = 3
+    limiter._hit("idle", 0)
+    limiter._hit("busy", 100)
+    limiter._hit("busy", 101)
+    assert set(limiter._hits) == {"busy"}